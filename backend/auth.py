@@ -1,16 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 from dotenv import load_dotenv
+import asyncio
 import os
+import threading
 
-from database import get_db
+from cache import TTLCache
+from database import get_db, run_db
 from models import User
-from schemas import TokenData
+from schemas import TokenData, CurrentUser
 
 load_dotenv()
 
@@ -20,11 +25,31 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 PASSWORD_RESET_TOKEN_EXPIRE_MINUTES = int(os.getenv("PASSWORD_RESET_TOKEN_EXPIRE_MINUTES", "15"))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated-user cache (per worker); TTL bounds staleness across workers
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+
+user_cache = TTLCache(maxsize=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL)
+
+# Password hashing; hashes with any other cost are rehashed on next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so a small dedicated thread pool hashes in parallel
+# without tying up the threadpool that serves catalogue reads.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
 
 # JWT token security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
@@ -34,6 +59,46 @@ def get_password_hash(password: str) -> str:
     """Hash a password."""
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """Bounded worker pool for bcrypt; rejects work with 429 once the queue is full."""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many authentication requests, please retry shortly",
+                    headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+                )
+            self._pending += 1
+        try:
+            return await asyncio.wrap_future(self._executor.submit(fn, *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the bcrypt pool."""
+    return await password_hasher.run(pwd_context.hash, password)
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify on the bcrypt pool; also returns a new hash if the stored cost is outdated."""
+    return await password_hasher.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -50,40 +115,119 @@ def verify_token(token: str, credentials_exception: HTTPException) -> TokenData:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        # Password reset tokens are signed with the same key but aren't logins
+        if email is None or payload.get("purpose") is not None:
             raise credentials_exception
-        token_data = TokenData(email=email)
+        token_data = TokenData(
+            email=email,
+            user_id=payload.get("user_id"),
+            role=payload.get("role")
+        )
         return token_data
     except JWTError:
         raise credentials_exception
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get the current authenticated user."""
-    credentials_exception = HTTPException(
+def invalidate_cached_user(user_id: int) -> None:
+    """Drop a user from the auth cache after their password or role changes."""
+    user_cache.delete(user_id)
+
+# Columns a cached CurrentUser is derived from or vouches for
+_CACHED_USER_COLUMNS = ("email", "name", "role", "password_hash")
+
+def _forget_user_on_commit(target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_users", set()).add(target.id)
+
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _CACHED_USER_COLUMNS):
+        _forget_user_on_commit(target)
+
+def _user_deleted(mapper, connection, target):
+    _forget_user_on_commit(target)
+
+def _forget_users_after_commit(session):
+    # After the commit, so a concurrent request can't re-cache the old row
+    for user_id in session.info.pop("changed_users", ()):
+        invalidate_cached_user(user_id)
+
+def _discard_after_rollback(session):
+    session.info.pop("changed_users", None)
+
+# ORM writes only; a Core UPDATE of users has to call invalidate_cached_user
+event.listen(User, "after_update", _user_updated)
+event.listen(User, "after_delete", _user_deleted)
+event.listen(Session, "after_commit", _forget_users_after_commit)
+event.listen(Session, "after_rollback", _discard_after_rollback)
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def get_user_by_email(db: Session, email: str) -> Optional[User]:
+    """Look up a user by email."""
+    return db.query(User).filter(User.email == email).first()
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> CurrentUser:
+    """Get the current authenticated user."""
+    credentials_exception = _credentials_exception()
     
     token_data = verify_token(credentials.credentials, credentials_exception)
-    user = db.query(User).filter(User.email == token_data.email).first()
+    if token_data.user_id is not None:
+        cached = user_cache.get(token_data.user_id)
+        if cached is not None and cached.email == token_data.email:
+            return cached
+
+    user = await run_db(db, get_user_by_email, token_data.email)
     
     if user is None:
         raise credentials_exception
     
-    return user
+    current_user = CurrentUser.model_validate(user)
+    user_cache.set(current_user.id, current_user)
+    return current_user
+
+async def get_current_user_stream(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    token: Optional[str] = None,
+    db: Session = Depends(get_db)
+) -> CurrentUser:
+    """Current user for event streams.
+
+    Browsers' EventSource can't send an Authorization header, so the token
+    may come as a ``token`` query parameter instead.
+    """
+    if credentials is None:
+        if not token:
+            raise _credentials_exception()
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return await get_current_user(credentials, db)
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+def _save_password_hash(db: Session, user: User, password_hash: str) -> None:
+    user.password_hash = password_hash
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+async def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     """Authenticate a user with email and password."""
-    user = db.query(User).filter(User.email == email).first()
+    user = await run_db(db, get_user_by_email, email)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    valid, new_hash = await verify_and_update_password_async(password, user.password_hash)
+    if not valid:
         return None
-    return user 
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made; store it at the new cost
+        await run_db(db, _save_password_hash, user, new_hash)
+    return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
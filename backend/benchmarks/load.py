@@ -0,0 +1,257 @@
+"""Drive the main API endpoints at fixed concurrency and write a JSON baseline.
+
+Seed first with benchmarks/seed.py, then either point at a running server
+
+    python benchmarks/load.py --url http://localhost:8000 --output before.json
+
+or leave out --url to run the app in-process against DATABASE_URL. Each
+scenario runs for --duration seconds with --concurrency clients and reports
+throughput, latency percentiles, status codes and SQL statements per request
+(from /metrics). --compare prints the change against an earlier report.
+Against a running server, start it with RATE_LIMIT_BACKEND=none unless the
+limiter itself is what you're measuring.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import func
+
+from database import DATABASE_URL, SessionLocal
+from models import Item, User
+
+ADMIN = {"email": "admin@withus.com", "password": "admin123"}
+BENCH_PASSWORD = "bench123"
+
+_METRIC_RE = re.compile(
+    r'^http_request_db_queries_(sum|count)\{method="(\w+)",route="([^"]+)"\} ([0-9.e+]+)$'
+)
+
+
+async def catalogue(client, ctx, rng):
+    params = {"limit": 50, "sort": rng.choice(["created_at", "price"])}
+    if rng.random() < 0.5:
+        params["category"] = rng.choice(ctx["categories"])
+    return await client.get("/api/items/", params=params)
+
+
+async def item_detail(client, ctx, rng):
+    return await client.get(f"/api/items/{rng.randint(*ctx['item_ids'])}")
+
+
+async def login(client, ctx, rng):
+    email = f"bench{rng.randrange(ctx['bench_users'])}@example.com"
+    return await client.post("/api/auth/login", json={"email": email, "password": BENCH_PASSWORD})
+
+
+async def order_create(client, ctx, rng):
+    order = {
+        "item_id": rng.randint(*ctx["item_ids"]),
+        "quantity": rng.randint(1, 3),
+        "service_type": "delivery",
+        "delivery_address": "12 MG Road, Bengaluru",
+        "mobile_number": "9876543210",
+    }
+    return await client.post("/api/orders/", json=order, headers=rng.choice(ctx["customer_headers"]))
+
+
+async def admin_list(client, ctx, rng):
+    return await client.get("/api/orders/all", params={"limit": 100}, headers=ctx["admin_headers"])
+
+
+# name: (scenario, method, route template reported by /metrics)
+SCENARIOS = {
+    "catalogue": (catalogue, "GET", "/api/items/"),
+    "item_detail": (item_detail, "GET", "/api/items/{item_id}"),
+    "login": (login, "POST", "/api/auth/login"),
+    "order_create": (order_create, "POST", "/api/orders/"),
+    "admin_list": (admin_list, "GET", "/api/orders/all"),
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def query_totals(client):
+    """{(method, route): [sum, count]} of SQL statements per request, from /metrics."""
+    totals = {}
+    response = await client.get("/metrics")
+    for line in response.text.splitlines():
+        match = _METRIC_RE.match(line)
+        if match:
+            kind, method, route, value = match.groups()
+            totals.setdefault((method, route), [0.0, 0.0])[kind == "count"] += float(value)
+    return totals
+
+
+async def _login(client, credentials):
+    response = await client.post("/api/auth/login", json=credentials)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def context(client, concurrency):
+    db = SessionLocal()
+    try:
+        item_ids = db.query(func.min(Item.id), func.max(Item.id)).one()
+        categories = [c for (c,) in db.query(Item.category).distinct()]
+        bench_users = db.query(func.count(User.id)).filter(User.email.like("bench%@example.com")).scalar()
+    finally:
+        db.close()
+    if not bench_users:
+        raise SystemExit("No bench users found; run benchmarks/seed.py first")
+    customers = [
+        {"email": f"bench{i}@example.com", "password": BENCH_PASSWORD}
+        for i in range(min(concurrency, bench_users))
+    ]
+    return {
+        "item_ids": item_ids,
+        "categories": categories,
+        "bench_users": bench_users,
+        "admin_headers": await _login(client, ADMIN),
+        "customer_headers": [await _login(client, c) for c in customers],
+    }
+
+
+async def run_scenario(client, ctx, name, concurrency, duration, seed):
+    scenario, method, route = SCENARIOS[name]
+    latencies = []
+    statuses = Counter()
+    before = (await query_totals(client)).get((method, route), [0.0, 0.0])
+    deadline = time.perf_counter() + duration
+
+    async def worker(n):
+        rng = random.Random(seed + n)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await scenario(client, ctx, rng)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    after = (await query_totals(client)).get((method, route), [0.0, 0.0])
+    served = after[1] - before[1]
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    return {
+        "requests": len(latencies),
+        "errors": len(latencies) - ok,
+        "statuses": dict(statuses),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2) if latencies else None,
+            "p95": round(percentile(latencies, 95), 2) if latencies else None,
+            "p99": round(percentile(latencies, 99), 2) if latencies else None,
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "max": round(latencies[-1], 2) if latencies else None,
+        },
+        "db_queries_per_request": round((after[0] - before[0]) / served, 2) if served else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    if args.url:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=args.concurrency))
+        client = httpx.AsyncClient(base_url=args.url, transport=transport, timeout=60)
+    else:
+        # Every in-process client shares one address; measure the app, not the limiter
+        os.environ.setdefault("RATE_LIMIT_BACKEND", "none")
+        os.environ.setdefault("LOAD_SHED_MAX_IN_FLIGHT", "0")
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    async with client:
+        ctx = await context(client, args.concurrency)
+        results = {}
+        for name in args.scenarios:
+            print(f"[Bench] {name}: {args.concurrency} clients for {args.duration}s", file=sys.stderr)
+            results[name] = await run_scenario(
+                client, ctx, name, args.concurrency, args.duration, args.seed
+            )
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "target": args.url or "in-process",
+            "database": DATABASE_URL.split(":", 1)[0],
+            "db_mode": os.getenv("DB_MODE", "sync"),
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "python": platform.python_version(),
+        },
+        "scenarios": results,
+    }
+
+
+def compare(report, baseline):
+    """Relative change per scenario; positive throughput and negative latency are better."""
+    changes = {}
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+
+        def delta(new, old):
+            return None if new is None or not old else round((new - old) / old * 100, 1)
+
+        changes[name] = {
+            "throughput_pct": delta(current["throughput_rps"], previous["throughput_rps"]),
+            "p95_pct": delta(current["latency_ms"]["p95"], previous["latency_ms"]["p95"]),
+            "p99_pct": delta(current["latency_ms"]["p99"], previous["latency_ms"]["p99"]),
+            "db_queries_per_request": [previous["db_queries_per_request"], current["db_queries_per_request"]],
+        }
+    return changes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server; omit to run in-process")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    parser.add_argument("--compare", help="earlier report to diff against")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare(report, json.load(f))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,211 @@
+"""Seed a throwaway database with benchmark volumes.
+
+Runs init_db first (schema plus the sample admin/customer accounts), then
+bulk-inserts users, items, reviews and orders with Core executemany batches.
+At --scale 1 that is 100k items, 1M reviews and 500k orders; use a small
+scale such as 0.01 for a quick run. Point DATABASE_URL at SQLite or a local
+Postgres you don't mind filling:
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed.py --scale 0.1
+
+Every seeded customer logs in as bench<N>@example.com / bench123.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import bindparam, func, insert, text, update
+
+import init_db
+from auth import get_password_hash
+from database import SessionLocal
+from models import Item, Order, OrderLine, OrderStatus, Review, ServiceType, User
+from sales import rebuild_sales_rollups
+
+BENCH_PASSWORD = "bench123"
+BATCH_SIZE = 20000
+REVIEWS_PER_USER = 50
+
+CATEGORIES = ["fruits", "dairy", "beverages", "vegetables", "bakery", "snacks", "grains", "spices"]
+ADJECTIVES = ["Fresh", "Organic", "Farm", "Homemade", "Premium", "Local", "Seasonal", "Natural"]
+NOUNS = ["Mangoes", "Milk", "Coconut Water", "Apples", "Curd", "Bread", "Rice", "Tomatoes",
+         "Bananas", "Paneer", "Cookies", "Turmeric", "Spinach", "Ghee", "Lentils", "Juice"]
+COMMENTS = ["Great quality, will order again.", "Fresh and well packed.", "Good value for money.",
+            "Delivery was on time.", "Average, expected better.", None]
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _bulk_insert(db, model, rows, label):
+    started = time.perf_counter()
+    total = 0
+    for batch in _batches(rows):
+        db.execute(insert(model), batch)
+        db.commit()
+        total += len(batch)
+        print(f"\r[Seed] {label}: {total:,}", end="", flush=True)
+    print(f"\r[Seed] {label}: {total:,} in {time.perf_counter() - started:.1f}s")
+
+
+def _next_id(db, model):
+    return (db.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def seed(scale: float, seed_value: int = 42):
+    rng = random.Random(seed_value)
+    n_items = max(10, int(100_000 * scale))
+    n_reviews = max(10, int(1_000_000 * scale))
+    n_orders = max(10, int(500_000 * scale))
+    n_users = max(10, -(-n_reviews // REVIEWS_PER_USER))
+    now = datetime.now(timezone.utc)
+
+    init_db.init_db()
+    db = SessionLocal()
+    try:
+        # One hash shared by every bench user; hashing each would take hours
+        password_hash = get_password_hash(BENCH_PASSWORD)
+        first_user = _next_id(db, User)
+        _bulk_insert(db, User, (
+            {
+                "id": first_user + i,
+                "name": f"Bench User {i}",
+                "email": f"bench{i}@example.com",
+                "password_hash": password_hash,
+                "role": "customer",
+                "created_at": now - timedelta(days=365, minutes=i),
+            }
+            for i in range(n_users)
+        ), "users")
+
+        first_item = _next_id(db, Item)
+        prices = {}
+
+        def items():
+            for i in range(n_items):
+                price = round(rng.uniform(10, 500), 2)
+                prices[first_item + i] = price
+                noun = rng.choice(NOUNS)
+                yield {
+                    "id": first_item + i,
+                    "name": f"{rng.choice(ADJECTIVES)} {noun} {i}",
+                    "description": f"{rng.choice(ADJECTIVES)} {noun.lower()} sourced from local farms, batch {i}",
+                    "image_url": None,
+                    "price": price,
+                    "category": rng.choice(CATEGORIES),
+                    # Enough stock that order-create benchmarks never run dry
+                    "stock_quantity": 1_000_000,
+                    "created_at": now - timedelta(days=300, seconds=-i * 60),
+                }
+        _bulk_insert(db, Item, items(), "items")
+
+        # Each user reviews a run of distinct items, keeping (user, item) unique
+        aggregates = defaultdict(lambda: [0, 0, 0, 0, 0, 0, 0])
+
+        def reviews():
+            first_review = _next_id(db, Review)
+            for n in range(n_reviews):
+                user, k = divmod(n, REVIEWS_PER_USER)
+                item_id = first_item + (user * REVIEWS_PER_USER + k) % n_items
+                rating = rng.choices((1, 2, 3, 4, 5), weights=(1, 1, 2, 4, 4))[0]
+                counts = aggregates[item_id]
+                counts[0] += 1
+                counts[1] += rating
+                counts[1 + rating] += 1
+                yield {
+                    "id": first_review + n,
+                    "user_id": first_user + user,
+                    "item_id": item_id,
+                    "rating": rating,
+                    "comment": rng.choice(COMMENTS),
+                    "created_at": now - timedelta(days=200, seconds=-n * 10),
+                }
+        _bulk_insert(db, Review, reviews(), "reviews")
+
+        started = time.perf_counter()
+        stmt = update(Item).where(Item.id == bindparam("item_id")).values(
+            review_count=bindparam("review_count"),
+            rating_sum=bindparam("rating_sum"),
+            rating_1=bindparam("r1"), rating_2=bindparam("r2"), rating_3=bindparam("r3"),
+            rating_4=bindparam("r4"), rating_5=bindparam("r5"),
+        )
+        rows = (
+            {"item_id": item_id, "review_count": c[0], "rating_sum": c[1],
+             "r1": c[2], "r2": c[3], "r3": c[4], "r4": c[5], "r5": c[6]}
+            for item_id, c in aggregates.items()
+        )
+        for batch in _batches(rows):
+            db.connection().execute(stmt, batch)
+            db.commit()
+        print(f"[Seed] rating aggregates in {time.perf_counter() - started:.1f}s")
+
+        first_order = _next_id(db, Order)
+        lines = []
+        statuses = [OrderStatus.COMPLETED] * 6 + [OrderStatus.PENDING, OrderStatus.CONFIRMED,
+                                                  OrderStatus.IN_PROGRESS, OrderStatus.CANCELLED]
+
+        def orders():
+            first_line = _next_id(db, OrderLine)
+            for n in range(n_orders):
+                order_id = first_order + n
+                item_id = first_item + rng.randrange(n_items)
+                quantity = rng.randint(1, 5)
+                status = rng.choice(statuses)
+                lines.append({
+                    "id": first_line + n, "order_id": order_id, "item_id": item_id,
+                    "quantity": quantity, "unit_price": prices[item_id],
+                    "line_total": prices[item_id] * quantity,
+                })
+                yield {
+                    "id": order_id,
+                    "user_id": first_user + rng.randrange(n_users),
+                    "item_id": item_id,
+                    "service_type": ServiceType.DELIVERY,
+                    "status": status,
+                    "quantity": quantity,
+                    "total_price": prices[item_id] * quantity,
+                    "delivery_address": f"{rng.randint(1, 999)} MG Road, Bengaluru",
+                    "mobile_number": f"98{rng.randint(0, 99_999_999):08d}",
+                    "cancellation_reason": "Changed my mind" if status == OrderStatus.CANCELLED else None,
+                    "created_at": now - timedelta(days=100, seconds=-n * 15),
+                }
+        _bulk_insert(db, Order, orders(), "orders")
+        _bulk_insert(db, OrderLine, lines, "order lines")
+
+        started = time.perf_counter()
+        rebuild_sales_rollups(db)
+        print(f"[Seed] sales rollups in {time.perf_counter() - started:.1f}s")
+
+        if db.get_bind().dialect.name == "postgresql":
+            # Explicit ids leave the serial sequences behind
+            for table in ("users", "items", "reviews", "orders", "order_lines"):
+                db.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+                ))
+            db.execute(text("ANALYZE"))
+            db.commit()
+    finally:
+        db.close()
+    return {"users": n_users, "items": n_items, "reviews": n_reviews, "orders": n_orders}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="fraction of the full volumes")
+    parser.add_argument("--seed", type=int, default=42, help="random seed, for repeatable data")
+    args = parser.parse_args()
+    print(f"[Seed] {seed(args.scale, args.seed)}")
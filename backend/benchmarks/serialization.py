@@ -0,0 +1,95 @@
+"""Bytes on the wire and serialisation time for the large list endpoints.
+
+Builds synthetic /api/orders/all and /api/reviews/all payloads from the
+response schemas and renders them the way FastAPI does (response_model
+serialisation, then the response class), with and without compression.
+
+    python benchmarks/serialization.py [rows]
+"""
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zstandard
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from compression import GZIP_LEVEL, ZSTD_LEVEL
+from schemas import OrderWithDetails, ReviewWithUser
+
+
+def reviews(n):
+    now = datetime.now(timezone.utc)
+    return [
+        ReviewWithUser(
+            id=i, user_id=i % 500, item_id=i % 300, rating=i % 5 + 1,
+            comment=f"Review {i}: fresh and well packed, would order again." if i % 3 else None,
+            created_at=now - timedelta(minutes=i), user_name=f"Customer {i % 500}"
+        )
+        for i in range(n)
+    ]
+
+
+def orders(n):
+    now = datetime.now(timezone.utc)
+    item = {
+        "id": 1, "name": "Organic Bananas", "description": "Fresh organic bananas, 1 dozen",
+        "image_url": "https://example.com/bananas.jpg", "price": 60.0, "category": "fruits",
+        "stock_quantity": 100, "created_at": now, "average_rating": 4.5, "review_count": 12,
+    }
+    user = {"id": 2, "name": "John Doe", "email": "john@example.com", "role": "customer", "created_at": now}
+    return [
+        OrderWithDetails(
+            id=i, item_id=1, user_id=2, quantity=2, service_type="delivery", status="pending",
+            delivery_address=f"{i} MG Road, Bengaluru", mobile_number=f"98765{i:05d}",
+            total_price=120.0, created_at=now - timedelta(minutes=i), item=item, user=user,
+            lines=[{"id": i, "item_id": 1, "quantity": 2, "unit_price": 60.0, "line_total": 120.0}]
+        )
+        for i in range(n)
+    ]
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def measure(name, schema, payload):
+    report = {"endpoint": name, "rows": len(payload)}
+    field = create_model_field(name="response", type_=List[schema], mode="serialization")
+
+    def render(response_class):
+        content = asyncio.run(serialize_response(field=field, response_content=payload))
+        return response_class(content).body
+
+    for label, response_class in (("json", JSONResponse), ("orjson", ORJSONResponse)):
+        body, ms = timed(lambda: render(response_class))
+        report[f"{label}_ms"] = round(ms, 2)
+    report["identity_bytes"] = len(body)
+    compressed, ms = timed(lambda: gzip.compress(body, compresslevel=GZIP_LEVEL))
+    report.update(gzip_bytes=len(compressed), gzip_ms=round(ms, 2))
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    compressed, ms = timed(lambda: compressor.compress(body))
+    report.update(zstd_bytes=len(compressed), zstd_ms=round(ms, 2))
+    return report
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    results = [
+        measure("/api/orders/all", OrderWithDetails, orders(rows)),
+        measure("/api/reviews/all", ReviewWithUser, reviews(rows)),
+    ]
+    print(json.dumps(results, indent=2))
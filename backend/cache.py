@@ -0,0 +1,347 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from starlette.concurrency import run_in_threadpool
+
+from models import Item, Review
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# "memory" keeps entries per worker process, "redis" shares them between workers,
+# "none" disables response caching
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "withus:")
+
+# A cached response: rendered body plus the headers that go with it
+CachedResponse = Tuple[bytes, Dict[str, str]]
+
+
+class MemoryBackend:
+    """Per-process backend on top of TTLCache."""
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, maxsize: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self._entries = TTLCache(maxsize, ttl)
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        return self._entries.get(key)
+
+    def set(self, key: str, value: CachedResponse, ttl: float) -> None:
+        self._entries.set(key, value, ttl)
+
+    def generations(self, namespaces: Sequence[str]) -> List[int]:
+        return [self._generations.get(ns, 0) for ns in namespaces]
+
+    def bump(self, namespaces: Sequence[str]) -> None:
+        with self._lock:
+            for ns in namespaces:
+                self._generations[ns] = self._generations.get(ns, 0) + 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class RedisBackend:
+    """Backend shared by every worker process through Redis."""
+
+    name = "redis"
+    # Calls go over the network, so async callers run them off the event loop
+    blocking = True
+
+    def __init__(self, url: str = CACHE_REDIS_URL, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("CACHE_BACKEND=redis needs the 'redis' package installed")
+            client = redis.Redis.from_url(url, socket_timeout=1)
+        self.client = client
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        raw = self.client.get(CACHE_KEY_PREFIX + key)
+        if raw is None:
+            return None
+        header_len = int.from_bytes(raw[:4], "big")
+        headers = json.loads(raw[4:4 + header_len])
+        return raw[4 + header_len:], headers
+
+    def set(self, key: str, value: CachedResponse, ttl: float) -> None:
+        body, headers = value
+        encoded = json.dumps(headers).encode()
+        raw = len(encoded).to_bytes(4, "big") + encoded + body
+        self.client.set(CACHE_KEY_PREFIX + key, raw, px=int(ttl * 1000))
+
+    def generations(self, namespaces: Sequence[str]) -> List[int]:
+        values = self.client.mget([f"{CACHE_KEY_PREFIX}gen:{ns}" for ns in namespaces])
+        return [int(value or 0) for value in values]
+
+    def bump(self, namespaces: Sequence[str]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for ns in namespaces:
+            pipe.incr(f"{CACHE_KEY_PREFIX}gen:{ns}")
+        pipe.execute()
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=f"{CACHE_KEY_PREFIX}*"):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """Read-through cache for rendered responses, invalidated by namespace.
+
+    Every key is stored under the current generation of its namespaces, so
+    invalidating bumps a counter instead of hunting down keys; the stale
+    entries are never read again and age out through the TTL.
+    """
+
+    def __init__(self, backend=None, ttl: float = CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+        # Invalidations handed off the event loop and not yet applied
+        self._pending: Set[Future] = set()
+        self._invalidator: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _versioned_key(self, namespaces: Sequence[str], key: str) -> str:
+        generations = self.backend.generations(namespaces)
+        return ":".join(f"{ns}@{gen}" for ns, gen in zip(namespaces, generations)) + "|" + key
+
+    def _get(self, namespaces: Sequence[str], key: str):
+        versioned = self._versioned_key(namespaces, key)
+        return versioned, self.backend.get(versioned)
+
+    async def _call(self, fn, *args):
+        if self.backend.blocking:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    async def _wait_for_invalidations(self) -> None:
+        with self._lock:
+            pending = list(self._pending)
+        if pending:
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in pending), return_exceptions=True)
+
+    async def lookup(self, namespaces: Sequence[str], key: str):
+        """Return ``(versioned_key, cached)``; pass the key to ``store`` after a miss."""
+        if not self.enabled:
+            return None, None
+        # This worker's own writes are visible to its next read
+        await self._wait_for_invalidations()
+        try:
+            versioned, value = await self._call(self._get, namespaces, key)
+        except Exception as e:
+            # A cache outage must not take the catalogue down with it
+            self._count("errors")
+            print(f"[Cache] Lookup failed: {e}")
+            return None, None
+        self._count("hits" if value is not None else "misses")
+        return versioned, value
+
+    async def store(self, versioned_key: Optional[str], value: CachedResponse) -> None:
+        if versioned_key is None:
+            return
+        try:
+            await self._call(self.backend.set, versioned_key, value, self.ttl)
+        except Exception as e:
+            self._count("errors")
+            print(f"[Cache] Store failed: {e}")
+
+    async def get_or_build(
+        self,
+        namespaces: Sequence[str],
+        key: str,
+        build: Callable[[], Awaitable[CachedResponse]]
+    ) -> CachedResponse:
+        """Return the cached response for ``key``, building and storing it on a miss."""
+        versioned, value = await self.lookup(namespaces, key)
+        if value is None:
+            value = await build()
+            await self.store(versioned, value)
+        return value
+
+    def invalidate(self, *namespaces: str) -> None:
+        """Bump ``namespaces``; never blocks an event loop on a network backend.
+
+        Commits in DB_MODE=async run on the event loop, so a Redis round trip
+        from there is handed to a background thread instead. Invalidations
+        stay in order, and ``lookup`` waits for outstanding ones first.
+        """
+        if not self.enabled or not namespaces:
+            return
+        if self.backend.blocking and _on_event_loop():
+            with self._lock:
+                if self._invalidator is None:
+                    self._invalidator = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-invalidate")
+                future = self._invalidator.submit(self._bump, namespaces)
+                self._pending.add(future)
+            future.add_done_callback(self._forget)
+            return
+        self._bump(namespaces)
+
+    def _forget(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+    def _bump(self, namespaces: Sequence[str]) -> None:
+        try:
+            self.backend.bump(namespaces)
+            self._count("invalidations", len(namespaces))
+        except Exception as e:
+            self._count("errors")
+            print(f"[Cache] Invalidation failed: {e}")
+
+    def clear(self) -> None:
+        if self.enabled:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_ratio"] = round(counters["hits"] / lookups, 4) if lookups else None
+        counters["backend"] = self.backend.name if self.enabled else "none"
+        if isinstance(self.backend, MemoryBackend):
+            counters["entries"] = len(self.backend._entries)
+        return counters
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _make_backend():
+    if CACHE_BACKEND == "none":
+        return None
+    if CACHE_BACKEND == "redis":
+        return RedisBackend()
+    return MemoryBackend()
+
+
+response_cache = ResponseCache(_make_backend())
+
+# Namespaces for catalogue responses. Every catalogue key sits under
+# ALL_ITEMS; lists and categories also under CATALOGUE, which any item change
+# bumps, while an item's detail page only depends on its own namespace.
+ALL_ITEMS_NAMESPACE = "items"
+CATALOGUE_NAMESPACE = "catalogue"
+
+
+def item_namespace(item_id: int) -> str:
+    return f"item:{item_id}"
+
+
+def mark_items_changed(session, item_ids: Optional[Iterable[int]] = None) -> None:
+    """Invalidate cached catalogue responses for these items once ``session`` commits.
+
+    Pass no ids after a bulk change to drop every item. ORM writes to items
+    and reviews are picked up automatically; Core UPDATEs (stock, rating
+    aggregates) have to call this.
+    """
+    pending = session.info.setdefault("changed_items", set())
+    if item_ids is None:
+        session.info["all_items_changed"] = True
+    else:
+        pending.update(item_ids)
+
+
+def _item_written(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        mark_items_changed(session, [target.id])
+
+
+def _review_written(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        mark_items_changed(session, [target.item_id])
+
+
+def _invalidate_after_commit(session):
+    # Invalidating after the commit means a concurrent reader can't cache
+    # rows from before it under the new generation
+    changed = session.info.pop("changed_items", None)
+    if session.info.pop("all_items_changed", False):
+        response_cache.invalidate(ALL_ITEMS_NAMESPACE)
+    elif changed:
+        response_cache.invalidate(CATALOGUE_NAMESPACE, *(item_namespace(i) for i in changed))
+
+
+def _discard_after_rollback(session):
+    session.info.pop("changed_items", None)
+    session.info.pop("all_items_changed", None)
+
+
+for _event in ("after_insert", "after_update", "after_delete"):
+    event.listen(Item, _event, _item_written)
+    event.listen(Review, _event, _review_written)
+event.listen(Session, "after_commit", _invalidate_after_commit)
+event.listen(Session, "after_rollback", _discard_after_rollback)
@@ -0,0 +1,96 @@
+import os
+from typing import List, Optional
+
+import zstandard
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Encodings offered, in order of preference when the client accepts several
+COMPRESSION_ENCODINGS = [
+    e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "zstd,gzip").lower().split(",") if e.strip()
+]
+# Bodies smaller than this go out as-is; compressing them costs more than it saves
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+
+class ZstdResponder(IdentityResponder):
+    content_encoding = "zstd"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int = ZSTD_LEVEL) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.stream = None
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self.stream is None and not more_body:
+            # Whole body at once: a single frame that records its size
+            return self.compressor.compress(body)
+        if self.stream is None:
+            self.stream = self.compressor.compressobj()
+        chunk = self.stream.compress(body)
+        if more_body:
+            # Flush each chunk so streamed rows reach the client as they are produced
+            return chunk + self.stream.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return chunk + self.stream.flush()
+
+
+def negotiate_encoding(accept_encoding: str, offered: List[str] = COMPRESSION_ENCODINGS) -> Optional[str]:
+    """Pick the first offered encoding the client accepts with a non-zero q-value."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip()] = q
+    for encoding in offered:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """Compress responses with zstd or gzip, whichever the client prefers of those offered.
+
+    Builds on Starlette's gzip responders, so already-encoded bodies and
+    event streams pass through untouched and streamed bodies are compressed
+    chunk by chunk.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        encodings: List[str] = COMPRESSION_ENCODINGS,
+        gzip_level: int = GZIP_LEVEL,
+        zstd_level: int = ZSTD_LEVEL
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = encodings
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(
+            Headers(scope=scope).get("Accept-Encoding", ""), self.encodings
+        )
+        if encoding == "zstd":
+            responder = ZstdResponder(self.app, self.minimum_size, self.zstd_level)
+        elif encoding == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
@@ -0,0 +1,74 @@
+import hashlib
+import os
+from typing import Awaitable, Callable, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+
+from cache import CachedResponse, response_cache
+
+# Seconds browsers may reuse a public response before revalidating it
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+
+PUBLIC_CACHE = f"public, max-age={HTTP_CACHE_MAX_AGE}, must-revalidate"
+PRIVATE_CACHE = "private, max-age=0, must-revalidate"
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over a version stamp, so compressed variants share it."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of ``etag`` against the request's If-None-Match."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def _respond(request: Request, value: CachedResponse, cache_control: str) -> Response:
+    body, headers = value
+    etag = headers.get("ETag")
+    if etag and etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**headers, "Cache-Control": cache_control}
+    )
+
+
+async def conditional_json(
+    request: Request,
+    build: Callable[[], Awaitable[CachedResponse]],
+    stamp: Optional[Callable[[], Awaitable[Optional[str]]]] = None,
+    cache_key: Optional[Tuple[Sequence[str], str]] = None,
+    cache_control: str = PUBLIC_CACHE
+) -> Response:
+    """Serve a rendered JSON response, answering If-None-Match with 304 early.
+
+    ``build`` renders the body and returns it with its headers, ETag included.
+    With ``cache_key`` a cached copy's ETag decides without touching the
+    database; otherwise ``stamp`` computes the ETag with one cheap query and
+    the body is only built when the client's copy is out of date.
+    """
+    versioned = None
+    if cache_key is not None:
+        versioned, cached = await response_cache.lookup(*cache_key)
+        if cached is not None:
+            return _respond(request, cached, cache_control)
+    if stamp is not None and request.headers.get("if-none-match"):
+        etag = await stamp()
+        if etag and etag_matches(request, etag):
+            return not_modified(etag, cache_control)
+    value = await build()
+    await response_cache.store(versioned, value)
+    return _respond(request, value, cache_control)
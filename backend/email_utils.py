@@ -2,23 +2,37 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import time
 from dotenv import load_dotenv
 
+from models import EmailOutbox
+from metrics import EMAIL_SEND_LATENCY
+
 load_dotenv()
 
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
 EMAIL_USER = os.getenv('EMAIL_USER')
 EMAIL_PASS = os.getenv('EMAIL_PASS')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True').lower() == 'true'
 ADMIN_EMAIL = os.getenv('ADMIN_EMAIL')
 
 
-def send_admin_order_notification(order):
+def queue_email(db, recipient, subject, body):
+    """Add a message to the outbox; it is delivered once the caller commits."""
+    db.add(EmailOutbox(recipient=recipient, subject=subject, body=body))
+
+
+def queue_admin_order_notification(db, order):
     if not (EMAIL_USER and EMAIL_PASS and ADMIN_EMAIL):
         print("[Email] Email credentials not set. Skipping email notification.")
         return
     subject = f"New Order Placed: Order #{order.id}"
     user_name = getattr(order.user, 'name', 'Unknown')
+    items = "\n".join(
+        f"  - Item ID {line.item_id} x {line.quantity} @ ₹{line.unit_price}"
+        for line in order.lines
+    )
     body = f"""
 A new order has been placed.
 
@@ -26,7 +40,8 @@ Received order from: {user_name}
 
 Order ID: {order.id}
 User ID: {order.user_id}
-Item ID: {order.item_id}
+Items:
+{items}
 Quantity: {order.quantity}
 Service Type: {order.service_type}
 Mobile Number: {order.mobile_number}
@@ -36,23 +51,10 @@ Total Price: ₹{order.total_price}
 
 Please log in to the admin dashboard to accept or cancel this order.
 """
-    msg = MIMEMultipart()
-    msg['From'] = EMAIL_USER
-    msg['To'] = ADMIN_EMAIL
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-    try:
-        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT)
-        server.starttls()
-        server.login(EMAIL_USER, EMAIL_PASS)
-        server.sendmail(EMAIL_USER, ADMIN_EMAIL, msg.as_string())
-        server.quit()
-        print(f"[Email] Admin notified for order {order.id}")
-    except Exception as e:
-        print(f"[Email] Failed to send admin notification: {e}")
-
-
-def send_user_order_status_notification(order):
+    queue_email(db, ADMIN_EMAIL, subject, body)
+
+
+def queue_user_order_status_notification(db, order):
     if not (EMAIL_USER and EMAIL_PASS):
         print("[Email] Email credentials not set. Skipping user notification.")
         return
@@ -66,17 +68,68 @@ def send_user_order_status_notification(order):
         body = f"Hello {user_name},\n\nYour order #{order.id} has been cancelled.\nReason: {order.cancellation_reason}\n\nIf you have questions, please contact support."
     else:
         body = f"Hello {user_name},\n\nYour order #{order.id} has been accepted and is now '{order.status.value}'.\n\nThank you for ordering with us!"
-    msg = MIMEMultipart()
-    msg['From'] = EMAIL_USER
-    msg['To'] = user_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-    try:
-        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT)
-        server.starttls()
-        server.login(EMAIL_USER, EMAIL_PASS)
-        server.sendmail(EMAIL_USER, user_email, msg.as_string())
-        server.quit()
-        print(f"[Email] User notified for order {order.id}")
-    except Exception as e:
-        print(f"[Email] Failed to send user notification: {e}") 
\ No newline at end of file
+    queue_email(db, user_email, subject, body)
+
+
+def queue_password_reset_email(db, user, reset_link):
+    if not (EMAIL_USER and EMAIL_PASS):
+        print(f"[Email] Credentials not set. Reset link for {user.email}: {reset_link}")
+        return
+    subject = "Reset your WithUs password"
+    body = f"""
+Hello {user.name},
+
+We received a request to reset your password for your WithUs account.
+Click the link below to choose a new password. This link expires soon.
+
+{reset_link}
+
+If you did not request a password reset, you can ignore this email.
+"""
+    queue_email(db, user.email, subject, body)
+
+
+class SMTPSender:
+    """One authenticated SMTP connection, reopened only when it drops."""
+
+    def __init__(self):
+        self.server = None
+
+    def _connect(self):
+        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT, timeout=30)
+        if EMAIL_USE_TLS:
+            server.starttls()
+        if EMAIL_USER and EMAIL_PASS:
+            server.login(EMAIL_USER, EMAIL_PASS)
+        self.server = server
+
+    def send(self, recipient, subject, body):
+        msg = MIMEMultipart()
+        msg['From'] = EMAIL_USER
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+        started = time.perf_counter()
+        result = "error"
+        try:
+            if self.server is None:
+                self._connect()
+            try:
+                self.server.sendmail(EMAIL_USER, recipient, msg.as_string())
+            except smtplib.SMTPServerDisconnected:
+                # Idle connections get dropped by the server; retry once on a fresh one
+                self._connect()
+                self.server.sendmail(EMAIL_USER, recipient, msg.as_string())
+            result = "sent"
+        finally:
+            EMAIL_SEND_LATENCY.labels(result).observe(time.perf_counter() - started)
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        finally:
+            self.server = None
@@ -0,0 +1,265 @@
+import asyncio
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+import orjson
+
+from cache import CACHE_BACKEND, CACHE_KEY_PREFIX, CACHE_REDIS_URL
+from metrics import SSE_DROPPED, SSE_SUBSCRIBERS
+from schemas import CurrentUser
+
+# Events buffered per connection; a client that falls further behind is sent
+# a "resync" event and disconnected, and refetches once it reconnects
+SSE_BUFFER_SIZE = int(os.getenv("SSE_BUFFER_SIZE", "64"))
+# Comment line sent on idle connections so proxies don't time them out
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Delay the browser waits before reconnecting a dropped stream
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "3000"))
+# Open streams allowed per worker process
+SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", "10000"))
+# "redis" relays events between worker processes over pub/sub, so a stream
+# sees changes whichever worker made them; "memory" only reaches streams on
+# the worker that made the change (serve.py then runs a single worker)
+SSE_BACKEND = os.getenv("SSE_BACKEND", "redis" if CACHE_BACKEND == "redis" else "memory").lower()
+SSE_REDIS_URL = os.getenv("SSE_REDIS_URL", CACHE_REDIS_URL)
+SSE_REDIS_CHANNEL = CACHE_KEY_PREFIX + "order-events"
+
+ORDER_CREATED = "order_created"
+ORDER_STATUS_CHANGED = "order_status_changed"
+
+
+class Subscription:
+    __slots__ = ("user_id", "is_admin", "queue", "overflowed")
+
+    def __init__(self, user: CurrentUser, buffer: int):
+        self.user_id = user.id
+        self.is_admin = user.role == "admin"
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+        self.overflowed = False
+
+
+class RedisEventRelay:
+    """Carries order events between worker processes over Redis pub/sub.
+
+    Publishes go out in order on one background thread, so request handlers
+    never wait on Redis; a listener thread hands every event on the channel,
+    including this worker's own, back to the event loop for delivery.
+    """
+
+    def __init__(self, url: str = SSE_REDIS_URL, client=None, channel: str = SSE_REDIS_CHANNEL):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("SSE_BACKEND=redis needs the 'redis' package installed")
+            client = redis.Redis.from_url(url, socket_timeout=5)
+        self.client = client
+        self.channel = channel
+        self._pubsub = None
+        self._publisher: Optional[ThreadPoolExecutor] = None
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self, deliver: Callable[[str, int, str], None], lost: Callable[[], None]) -> None:
+        """Subscribe and start relaying; call from the event loop.
+
+        ``deliver`` gets each event on the loop; ``lost`` runs there when the
+        subscription broke and events may have been missed.
+        """
+        loop = asyncio.get_running_loop()
+        self._stop.clear()
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.channel)
+        self._publisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sse-publish")
+        self._listener = threading.Thread(
+            target=self._listen, args=(loop, deliver, lost), name="sse-relay", daemon=True
+        )
+        self._listener.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(5)
+            self._listener = None
+        if self._publisher is not None:
+            self._publisher.shutdown(wait=True)
+            self._publisher = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def publish(self, event: str, user_id: int, data: str) -> None:
+        if self._publisher is None:
+            return
+        self._publisher.submit(self._send, orjson.dumps([event, user_id, data]))
+
+    def _send(self, payload: bytes) -> None:
+        try:
+            self.client.publish(self.channel, payload)
+        except Exception as e:
+            print(f"[Events] Publish to Redis failed: {e}")
+
+    def _listen(self, loop: asyncio.AbstractEventLoop, deliver, lost) -> None:
+        while not self._stop.is_set():
+            try:
+                message = self._pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                # The next call reconnects and resubscribes; clients refetch
+                # whatever went by in between
+                print(f"[Events] Redis subscription failed: {e}")
+                loop.call_soon_threadsafe(lost)
+                self._stop.wait(1)
+                continue
+            if message is None:
+                continue
+            try:
+                event, user_id, data = orjson.loads(message["data"])
+            except (orjson.JSONDecodeError, TypeError, ValueError):
+                continue
+            loop.call_soon_threadsafe(deliver, event, user_id, data)
+
+
+class OrderEventBroker:
+    """Fan-out of order events to this worker's SSE connections.
+
+    Customers get events for their own orders, admins for every order. Each
+    event is encoded once and handed to subscribers without awaiting them,
+    so a slow client never holds up the publisher or anyone else. Runs on
+    the event loop: publish from request handlers, not from threads.
+
+    With a relay (SSE_BACKEND=redis) events published in any worker reach
+    every worker's subscribers; without one, only this worker's.
+    """
+
+    def __init__(
+        self,
+        buffer: int = SSE_BUFFER_SIZE,
+        max_connections: int = SSE_MAX_CONNECTIONS,
+        relay: Optional[RedisEventRelay] = None
+    ):
+        self.buffer = buffer
+        self.max_connections = max_connections
+        self.relay = relay
+        self.closed = False
+        self._relaying = False
+        self._by_user: Dict[int, Set[Subscription]] = {}
+        self._admins: Set[Subscription] = set()
+        self._count = 0
+        self._ids = itertools.count(1)
+
+    @property
+    def connections(self) -> int:
+        return self._count
+
+    @property
+    def full(self) -> bool:
+        return self._count >= self.max_connections
+
+    async def start(self) -> None:
+        """Start relaying; run from the app's lifespan startup."""
+        self.closed = False
+        if self.relay is not None and not self._relaying:
+            self.relay.start(self.deliver, self.resync_all)
+            self._relaying = True
+
+    def close(self) -> None:
+        """End every stream with a resync and refuse new ones; run from the lifespan shutdown."""
+        self.closed = True
+        self.resync_all()
+        if self._relaying:
+            self.relay.stop()
+            self._relaying = False
+
+    def resync_all(self) -> None:
+        """Tell every open stream to refetch and reconnect."""
+        for subscription in list(self._admins):
+            self._drop(subscription)
+        for subscribers in list(self._by_user.values()):
+            for subscription in list(subscribers):
+                self._drop(subscription)
+
+    def subscribe(self, user: CurrentUser) -> Subscription:
+        subscription = Subscription(user, self.buffer)
+        if subscription.is_admin:
+            self._admins.add(subscription)
+        else:
+            self._by_user.setdefault(subscription.user_id, set()).add(subscription)
+        self._count += 1
+        SSE_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription.is_admin:
+            found = subscription in self._admins
+            self._admins.discard(subscription)
+        else:
+            subscribers = self._by_user.get(subscription.user_id, set())
+            found = subscription in subscribers
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._by_user.pop(subscription.user_id, None)
+        if found:
+            self._count -= 1
+            SSE_SUBSCRIBERS.dec()
+
+    def _drop(self, subscription: Subscription) -> None:
+        subscription.overflowed = True
+        self.unsubscribe(subscription)
+        try:
+            # Wake a stream waiting on an empty queue; a full one isn't waiting
+            subscription.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    def publish(self, event: str, user_id: int, data: str) -> None:
+        """Send an event about one of ``user_id``'s orders; ``data`` is its JSON."""
+        if self._relaying:
+            self.relay.publish(event, user_id, data)
+        else:
+            self.deliver(event, user_id, data)
+
+    def deliver(self, event: str, user_id: int, data: str) -> None:
+        """Hand an event to this worker's subscribers."""
+        targets = list(self._admins)
+        targets.extend(self._by_user.get(user_id, ()))
+        if not targets:
+            return
+        message = f"id: {next(self._ids)}\nevent: {event}\ndata: {data}\n\n"
+        for subscription in targets:
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Stop feeding it; the stream tells the client to resync
+                self._drop(subscription)
+                SSE_DROPPED.inc()
+
+    async def stream(self, user: CurrentUser) -> AsyncIterator[str]:
+        """Body of one SSE response: buffered events, heartbeats while idle.
+
+        Subscribes on the first iteration, so a response that never starts
+        leaves nothing registered.
+        """
+        subscription = self.subscribe(user)
+        if self.closed:
+            self._drop(subscription)
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while True:
+                if subscription.overflowed and subscription.queue.empty():
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is not None:
+                    yield message
+        finally:
+            self.unsubscribe(subscription)
+
+
+order_events = OrderEventBroker(relay=RedisEventRelay() if SSE_BACKEND == "redis" else None)
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import IdempotencyKey
+
+# How long a key is remembered; a retry after this runs as a new request
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+IDEMPOTENCY_SWEEP_INTERVAL = float(os.getenv("IDEMPOTENCY_SWEEP_INTERVAL", "3600"))
+IDEMPOTENCY_SWEEP_BATCH = int(os.getenv("IDEMPOTENCY_SWEEP_BATCH", "5000"))
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(*parts: str) -> str:
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands timestamps back naive; they are stored in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def claim_key(
+    db: Session, user_id: int, key: str, fingerprint: str
+) -> Tuple[Optional[IdempotencyKey], Optional[str]]:
+    """Reserve ``key`` for this request, or find the response it already produced.
+
+    Returns ``(record, None)`` when the request should run: the caller fills
+    the record with ``store_response`` and commits it with the rest of its
+    work. Returns ``(None, body)`` for a replay.
+
+    The record is inserted before any other work, so a concurrent duplicate
+    blocks on the unique constraint until the first request commits (and then
+    replays its response) or rolls back (and then runs itself).
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key is limited to {MAX_KEY_LENGTH} characters")
+
+    for _ in range(2):
+        existing = db.scalars(
+            select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        ).first()
+        if existing is not None:
+            if _as_utc(existing.expires_at) > datetime.now(timezone.utc):
+                if existing.request_hash != fingerprint:
+                    raise HTTPException(
+                        status_code=422,
+                        detail="Idempotency-Key was already used for a different request"
+                    )
+                return None, existing.response_body
+            db.delete(existing)
+            # Flushed on its own: the unit of work would run the INSERT first
+            db.flush()
+
+        record = IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            request_hash=fingerprint,
+            expires_at=datetime.now(timezone.utc) + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+        )
+        db.add(record)
+        try:
+            db.flush()
+            return record, None
+        except IntegrityError:
+            # Another request with this key committed while we waited; read its response
+            db.rollback()
+    raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+
+
+def store_response(record: IdempotencyKey, body: str, status_code: int = 200, order_id: Optional[int] = None) -> None:
+    record.response_body = body
+    record.status_code = status_code
+    record.order_id = order_id
+
+
+def sweep_expired_keys(db: Session) -> int:
+    """Delete expired keys in small batches so the sweep never holds long locks."""
+    removed = 0
+    while True:
+        expired = select(IdempotencyKey.id).where(
+            IdempotencyKey.expires_at <= datetime.now(timezone.utc)
+        ).limit(IDEMPOTENCY_SWEEP_BATCH)
+        deleted = db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.id.in_(expired.scalar_subquery()))
+        ).rowcount
+        db.commit()
+        removed += deleted
+        if deleted < IDEMPOTENCY_SWEEP_BATCH:
+            return removed
+
+
+class IdempotencySweeper:
+    """Background thread that drops expired idempotency keys every IDEMPOTENCY_SWEEP_INTERVAL seconds."""
+
+    def __init__(self, session_factory=SessionLocal, interval: float = IDEMPOTENCY_SWEEP_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="idempotency-sweep", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            db = self.session_factory()
+            try:
+                removed = sweep_expired_keys(db)
+                if removed:
+                    print(f"[Idempotency] Swept {removed} expired keys")
+            except Exception as e:
+                db.rollback()
+                print(f"[Idempotency] Sweep failed: {e}")
+            finally:
+                db.close()
+
+
+idempotency_sweeper = IdempotencySweeper()
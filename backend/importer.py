@@ -0,0 +1,466 @@
+"""
+Bulk import of items, stock levels and historical orders from CSV or JSONL.
+
+    python importer.py items catalogue.csv
+    python importer.py stock levels.jsonl
+    python importer.py orders history.csv --batch-size 20000
+
+Files are read as a stream and written in batches, so memory use stays flat
+whatever the file size. Postgres batches are loaded with COPY, other
+databases with executemany. Columns (CSV header or JSON keys):
+
+    items   sku, name, price, category [, description, image_url, stock_quantity]
+    stock   sku, stock_quantity
+    orders  user_email, sku, quantity [, order_ref, unit_price, service_type,
+            status, created_at, delivery_address, mobile_number,
+            scheduled_time, cancellation_reason]
+
+Items are upserted by SKU: known SKUs are updated in place, keeping their
+stock when the row has none. Stock rows set the level of an existing SKU.
+Orders are inserted as history without touching stock; consecutive rows with
+the same order_ref become one multi-line order, and the sales rollups are
+rebuilt once the file is in. Rows that don't parse or refer to unknown
+users/SKUs are skipped and reported.
+
+The import runs in its own process and writes with Core statements, so the
+running API only notices through shared state. With CACHE_BACKEND=redis the
+catalogue caches are invalidated when the import finishes; with the memory
+backend each worker keeps serving its cached pages until CACHE_TTL runs out.
+The in-process search index (used when not on Postgres) picks the changes up
+at its next SEARCH_INDEX_REFRESH_SECONDS rebuild. Restart the API to see them
+straight away.
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import Column, Float, Integer, MetaData, Table, Text, exists, func, insert, select, text, update
+
+from cache import ALL_ITEMS_NAMESPACE, CACHE_BACKEND, CACHE_TTL, response_cache
+from database import SessionLocal, engine
+from models import Item, Order, OrderLine, OrderStatus, ServiceType, User
+from sales import rebuild_sales_rollups
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "50000"))
+# Keep bound parameters per IN (...) lookup under SQLite's limit
+LOOKUP_CHUNK = 5000
+MAX_REPORTED_ERRORS = 20
+
+# Per-connection staging tables that each batch is loaded into before merging
+_staging = MetaData()
+ITEM_STAGING = Table(
+    "import_items", _staging,
+    Column("sku", Text), Column("name", Text), Column("description", Text),
+    Column("image_url", Text), Column("price", Float), Column("category", Text),
+    Column("stock_quantity", Integer),
+    prefixes=["TEMPORARY"],
+)
+STOCK_STAGING = Table(
+    "import_stock", _staging,
+    Column("sku", Text), Column("stock_quantity", Integer),
+    prefixes=["TEMPORARY"],
+)
+
+
+class ImportStats:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors: List[str] = []
+        self.started = time.perf_counter()
+
+    def skip(self, line: int, reason: str):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line}: {reason}")
+
+    def progress(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows / elapsed if elapsed else 0
+        print(
+            f"[Import] {self.kind}: {self.rows:,} rows, {self.inserted:,} inserted, "
+            f"{self.updated:,} updated, {self.skipped:,} skipped ({rate:,.0f} rows/s)",
+            file=sys.stderr, flush=True
+        )
+
+    def summary(self) -> dict:
+        return {
+            "kind": self.kind,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "seconds": round(time.perf_counter() - self.started, 2),
+            "errors": self.errors,
+        }
+
+
+# Reading and parsing
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, row) from a CSV or JSONL file, one row at a time."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "jsonl":
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_no, orjson.loads(line)
+        else:
+            # Header is line 1
+            for line_no, row in enumerate(csv.DictReader(f), 2):
+                yield line_no, row
+
+
+def _text(row: dict, key: str, required: bool = False) -> Optional[str]:
+    value = row.get(key)
+    if value is not None:
+        value = str(value).strip()
+    if not value:
+        if required:
+            raise ValueError(f"missing {key}")
+        return None
+    return value
+
+
+def _number(row: dict, key: str, cast, required: bool = False):
+    value = _text(row, key, required)
+    if value is None:
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f"bad {key} {value!r}")
+
+
+def _timestamp(row: dict, key: str) -> Optional[datetime]:
+    value = _text(row, key)
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"bad {key} {value!r}")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _enum(row: dict, key: str, enum, default):
+    value = _text(row, key)
+    if value is None:
+        return default
+    try:
+        return enum(value.lower())
+    except ValueError:
+        raise ValueError(f"bad {key} {value!r}")
+
+
+def parse_item(row: dict) -> dict:
+    price = _number(row, "price", float, required=True)
+    if price < 0:
+        raise ValueError("negative price")
+    return {
+        "sku": _text(row, "sku", required=True),
+        "name": _text(row, "name", required=True),
+        "description": _text(row, "description"),
+        "image_url": _text(row, "image_url"),
+        "price": price,
+        "category": _text(row, "category", required=True),
+        "stock_quantity": _number(row, "stock_quantity", int),
+    }
+
+
+def parse_stock(row: dict) -> dict:
+    stock = _number(row, "stock_quantity", int, required=True)
+    if stock < 0:
+        raise ValueError("negative stock_quantity")
+    return {"sku": _text(row, "sku", required=True), "stock_quantity": stock}
+
+
+def parse_order_line(row: dict) -> dict:
+    quantity = _number(row, "quantity", int, required=True)
+    if quantity < 1:
+        raise ValueError("quantity must be at least 1")
+    return {
+        "order_ref": _text(row, "order_ref"),
+        "user_email": _text(row, "user_email", required=True),
+        "sku": _text(row, "sku", required=True),
+        "quantity": quantity,
+        "unit_price": _number(row, "unit_price", float),
+        "service_type": _enum(row, "service_type", ServiceType, ServiceType.DELIVERY),
+        "status": _enum(row, "status", OrderStatus, OrderStatus.COMPLETED),
+        "created_at": _timestamp(row, "created_at"),
+        "delivery_address": _text(row, "delivery_address"),
+        "mobile_number": _text(row, "mobile_number"),
+        "scheduled_time": _timestamp(row, "scheduled_time"),
+        "cancellation_reason": _text(row, "cancellation_reason"),
+    }
+
+
+def parsed_batches(rows: Iterable[Tuple[int, dict]], parse, stats: ImportStats, batch_size: int, key=None):
+    """Group parsed rows into batches, never splitting a run of rows with the same non-empty ``key``."""
+    batch = []
+    for line_no, row in rows:
+        stats.rows += 1
+        try:
+            parsed = parse(row)
+        except (ValueError, TypeError) as e:
+            stats.skip(line_no, str(e))
+            continue
+        run = key(parsed) if key else None
+        if len(batch) >= batch_size and (run is None or run != key(batch[-1][1])):
+            yield batch
+            batch = []
+        batch.append((line_no, parsed))
+    if batch:
+        yield batch
+
+
+# Loading
+
+@contextmanager
+def _copy_cursor(conn):
+    """The psycopg2 cursor for COPY, or None when the driver can't do it; closed on exit."""
+    if conn.dialect.name != "postgresql":
+        yield None
+        return
+    cursor = conn.connection.cursor()
+    try:
+        yield cursor if hasattr(cursor, "copy_expert") else None
+    finally:
+        cursor.close()
+
+
+def _csv_value(value):
+    if isinstance(value, (ServiceType, OrderStatus)):
+        # SQLAlchemy stores enum names, not values
+        return value.name
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def bulk_load(conn, table: Table, rows: List[dict]) -> None:
+    """Write rows with COPY on Postgres, executemany elsewhere."""
+    if not rows:
+        return
+    with _copy_cursor(conn) as cursor:
+        if cursor is None:
+            conn.execute(insert(table), rows)
+            return
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_csv_value(row[c]) for c in columns])
+        buffer.seek(0)
+        # Unquoted empty fields load as NULL
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+
+
+def _last_wins(batch: List[Tuple[int, dict]]) -> List[dict]:
+    """One row per SKU; a later row in the batch replaces an earlier one."""
+    return list({row["sku"]: row for _, row in batch}.values())
+
+
+def _lookup(conn, key_column, value_columns, keys) -> Dict:
+    """Map keys to rows of value_columns, in IN-list chunks."""
+    keys = list(keys)
+    found = {}
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[start:start + LOOKUP_CHUNK]
+        for row in conn.execute(select(key_column, *value_columns).where(key_column.in_(chunk))):
+            found[row[0]] = row[1:]
+    return found
+
+
+def import_items(conn, batch, stats: ImportStats) -> None:
+    rows = _last_wins(batch)
+    conn.execute(ITEM_STAGING.delete())
+    bulk_load(conn, ITEM_STAGING, rows)
+    staged = ITEM_STAGING.c
+    updated = conn.execute(
+        update(Item)
+        .where(Item.sku == staged.sku)
+        .values(
+            name=staged.name,
+            description=staged.description,
+            image_url=staged.image_url,
+            price=staged.price,
+            category=staged.category,
+            stock_quantity=func.coalesce(staged.stock_quantity, Item.stock_quantity),
+            version=Item.version + 1,
+        )
+    ).rowcount
+    inserted = conn.execute(
+        insert(Item).from_select(
+            ["sku", "name", "description", "image_url", "price", "category", "stock_quantity"],
+            select(
+                staged.sku, staged.name, staged.description, staged.image_url,
+                staged.price, staged.category, func.coalesce(staged.stock_quantity, 0)
+            ).where(~exists().where(Item.sku == staged.sku))
+        )
+    ).rowcount
+    stats.updated += updated
+    stats.inserted += inserted
+
+
+def import_stock(conn, batch, stats: ImportStats) -> None:
+    rows = _last_wins(batch)
+    conn.execute(STOCK_STAGING.delete())
+    bulk_load(conn, STOCK_STAGING, rows)
+    staged = STOCK_STAGING.c
+    updated = conn.execute(
+        update(Item)
+        .where(Item.sku == staged.sku)
+        .values(stock_quantity=staged.stock_quantity, version=Item.version + 1)
+    ).rowcount
+    stats.updated += updated
+    if updated < len(rows):
+        known = _lookup(conn, Item.sku, [], (row["sku"] for row in rows))
+        for line_no, row in batch:
+            if row["sku"] not in known:
+                stats.skip(line_no, f"unknown SKU {row['sku']!r}")
+
+
+def _order_ids(conn, count: int) -> Optional[List[int]]:
+    """Reserve ids from the Postgres sequence so orders and lines can be COPYed together."""
+    with _copy_cursor(conn) as cursor:
+        if cursor is None:
+            return None
+    return list(conn.execute(
+        text("SELECT nextval(pg_get_serial_sequence('orders', 'id')) FROM generate_series(1, :n)"),
+        {"n": count}
+    ).scalars())
+
+
+def import_orders(conn, batch, stats: ImportStats) -> None:
+    users = _lookup(conn, User.email, [User.id], {row["user_email"] for _, row in batch})
+    items = _lookup(conn, Item.sku, [Item.id, Item.price], {row["sku"] for _, row in batch})
+
+    # Consecutive rows sharing an order_ref are one order; rows without one stand alone
+    groups = []
+    for ref, lines in groupby(batch, key=lambda entry: entry[1]["order_ref"] or f"#{entry[0]}"):
+        valid = []
+        for line_no, row in lines:
+            if row["user_email"] not in users:
+                stats.skip(line_no, f"unknown user {row['user_email']!r}")
+            elif row["sku"] not in items:
+                stats.skip(line_no, f"unknown SKU {row['sku']!r}")
+            else:
+                valid.append(row)
+        if valid:
+            groups.append(valid)
+    if not groups:
+        return
+
+    now = datetime.now(timezone.utc)
+    orders, lines = [], []
+    for group in groups:
+        first = group[0]
+        order_lines = []
+        for row in group:
+            item_id, price = items[row["sku"]]
+            unit_price = row["unit_price"] if row["unit_price"] is not None else price
+            order_lines.append({
+                "item_id": item_id,
+                "quantity": row["quantity"],
+                "unit_price": unit_price,
+                "line_total": unit_price * row["quantity"],
+            })
+        orders.append({
+            "user_id": users[first["user_email"]][0],
+            "item_id": order_lines[0]["item_id"] if len(order_lines) == 1 else None,
+            "service_type": first["service_type"],
+            "status": first["status"],
+            "quantity": sum(line["quantity"] for line in order_lines),
+            "total_price": sum(line["line_total"] for line in order_lines),
+            "delivery_address": first["delivery_address"],
+            "mobile_number": first["mobile_number"],
+            "scheduled_time": first["scheduled_time"],
+            "cancellation_reason": first["cancellation_reason"],
+            "created_at": first["created_at"] or now,
+        })
+        lines.append(order_lines)
+
+    ids = _order_ids(conn, len(orders))
+    if ids is not None:
+        for order, order_id in zip(orders, ids):
+            order["id"] = order_id
+        bulk_load(conn, Order.__table__, orders)
+    else:
+        ids = list(conn.execute(
+            insert(Order).returning(Order.id, sort_by_parameter_order=True), orders
+        ).scalars())
+    bulk_load(conn, OrderLine.__table__, [
+        {"order_id": order_id, **line}
+        for order_id, order_lines in zip(ids, lines)
+        for line in order_lines
+    ])
+    stats.inserted += len(orders)
+
+
+def _order_ref(row: dict) -> Optional[str]:
+    return row["order_ref"]
+
+
+# kind: (parser, batch loader, staging table, key whose runs stay in one batch)
+IMPORTERS = {
+    "items": (parse_item, import_items, ITEM_STAGING, None),
+    "stock": (parse_stock, import_stock, STOCK_STAGING, None),
+    "orders": (parse_order_line, import_orders, None, _order_ref),
+}
+
+
+def run_import(kind: str, path: str, fmt: Optional[str] = None, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Import one file; each batch commits on its own, so progress survives a failure."""
+    parse, load, staging, key = IMPORTERS[kind]
+    stats = ImportStats(kind)
+    with engine.connect() as conn:
+        # One connection throughout, so the temporary staging table stays put
+        if staging is not None:
+            staging.create(conn, checkfirst=True)
+        for batch in parsed_batches(read_rows(path, fmt), parse, stats, batch_size, key):
+            load(conn, batch, stats)
+            conn.commit()
+            stats.progress()
+        if staging is not None:
+            # The connection goes back to the pool; don't leave the table on it
+            staging.drop(conn)
+            conn.commit()
+    if kind in ("items", "stock"):
+        # Only reaches the API workers through a shared (redis) backend
+        response_cache.invalidate(ALL_ITEMS_NAMESPACE)
+        if CACHE_BACKEND != "redis":
+            print(
+                f"[Import] API workers keep cached catalogue pages for up to {CACHE_TTL:g}s "
+                "(CACHE_BACKEND is not redis); restart them to serve the import now"
+            )
+    elif stats.inserted:
+        # History lands on arbitrary days; one set-based pass is cheaper than per-order updates
+        with SessionLocal() as db:
+            rebuild_sales_rollups(db)
+    stats.progress()
+    return stats.summary()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=list(IMPORTERS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    print(orjson.dumps(run_import(args.kind, args.path, args.format, args.batch_size),
+                       option=orjson.OPT_INDENT_2).decode())
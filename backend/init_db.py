@@ -1,13 +1,16 @@
-from database import engine, SessionLocal
-from models import Base, User, Item, Review, Order
+from database import SessionLocal
+from migrate import upgrade_database
+from models import User, Item, Review, Order, OrderLine
 from auth import get_password_hash
+from ratings import recompute_item_ratings
+from sales import rebuild_sales_rollups
 from models import ServiceType, OrderStatus
 from datetime import datetime
 
 def init_db():
     """Initialize the database with tables and sample data."""
-    # Create tables
-    Base.metadata.create_all(bind=engine)
+    # Create or upgrade the tables through the migrations
+    upgrade_database()
     
     db = SessionLocal()
     
@@ -124,6 +127,8 @@ def init_db():
         for review in reviews:
             db.add(review)
         
+        db.flush()
+        recompute_item_ratings(db)
         db.commit()
         
         # Create sample orders
@@ -135,6 +140,7 @@ def init_db():
                 status=OrderStatus.COMPLETED,
                 quantity=2,
                 total_price=240.0,
+                lines=[OrderLine(item_id=items[0].id, quantity=2, unit_price=120.0, line_total=240.0)],
                 delivery_address="123 Main St, City, State 12345",
                 mobile_number="9876543210",
                 cancellation_reason=None
@@ -146,6 +152,7 @@ def init_db():
                 status=OrderStatus.CONFIRMED,
                 quantity=1,
                 total_price=60.0,
+                lines=[OrderLine(item_id=items[1].id, quantity=1, unit_price=60.0, line_total=60.0)],
                 scheduled_time=datetime.now(),
                 mobile_number="9876543210",
                 cancellation_reason=None
@@ -156,6 +163,7 @@ def init_db():
             db.add(order)
         
         db.commit()
+        rebuild_sales_rollups(db)
         
         print("Database initialized successfully with sample data!")
         print(f"Created {len(items)} items, {len(reviews)} reviews, and {len(orders)} orders")
@@ -1,18 +1,56 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
 
+from database import dispose_engines, pool_status
+from migrate import verify_schema
+from cache import response_cache
+from compression import CompressionMiddleware
+from metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, mark_worker_stopped, render_metrics
+from profiling import SQL_PROFILE_HEADERS, QueryTimingMiddleware
+from ratelimit import RateLimitMiddleware
+from outbox import outbox_worker
+from idempotency import idempotency_sweeper
+from events import order_events
+
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Refuse to serve against a database the migrations haven't caught up with
+    verify_schema()
+    # Email outbox delivery runs beside the app in every worker process
+    outbox_worker.start()
+    idempotency_sweeper.start()
+    # Relays order events between workers and ends the streams on shutdown
+    await order_events.start()
+    yield
+    # Runs after the server has drained in-flight requests
+    order_events.close()
+    outbox_worker.stop()
+    idempotency_sweeper.stop()
+    await dispose_engines()
+    mark_worker_stopped()
+
 # Create FastAPI app
 app = FastAPI(
     title="WithUs API",
     description="API for WithUs - Consumable Items Platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Compress large bodies; registered first so CORS headers are added outside it
+app.add_middleware(CompressionMiddleware)
+
+# Rate limits and load shedding, inside CORS so browsers can read the 429/503
+app.add_middleware(RateLimitMiddleware, router_app=app)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -23,16 +61,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Query-Count", "Server-Timing", "Retry-After", "Idempotent-Replayed"],
 )
 
+# Inside the metrics middleware, whose per-request query stats it reports
+if SQL_PROFILE_HEADERS:
+    app.add_middleware(QueryTimingMiddleware)
+
+# Outermost, so latency covers every other middleware too
+app.add_middleware(MetricsMiddleware, router_app=app)
+
 # Import routers
-from routes import auth, items, orders, reviews
+from routes import analytics, auth, items, orders, reviews
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(items.router, prefix="/api/items", tags=["Items"])
 app.include_router(orders.router, prefix="/api/orders", tags=["Orders"])
 app.include_router(reviews.router, prefix="/api/reviews", tags=["Reviews"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
 
 @app.get("/")
 async def root():
@@ -42,6 +89,22 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/db")
+async def db_health_check():
+    """Connection pool usage and checkout wait times for this worker."""
+    return pool_status()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus exposition of request, SQL and email metrics."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/health/cache")
+async def cache_health_check():
+    """Catalogue response cache hit/miss counters for this worker."""
+    return response_cache.stats()
+
+# Development server; production runs through serve.py
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,122 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from database import QueryStats, current_query_stats
+
+# Set (by serve.py) when several workers must report through one /metrics
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to produce a response", ["method", "route"]
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being handled", ["method", "route"],
+    multiprocess_mode="livesum"
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements run per request", ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL per request", ["method", "route"]
+)
+RATE_LIMITED = Counter(
+    "http_requests_rate_limited_total", "Requests refused with 429 by a token bucket", ["route", "scope"]
+)
+LOAD_SHED = Counter(
+    "http_requests_shed_total", "Requests refused with 503 over the in-flight watermark", ["route"]
+)
+SSE_SUBSCRIBERS = Gauge(
+    "sse_subscribers", "Open order event streams", multiprocess_mode="livesum"
+)
+SSE_DROPPED = Counter(
+    "sse_subscribers_dropped_total", "Event streams closed because the client fell behind"
+)
+EMAIL_SEND_LATENCY = Histogram(
+    "email_send_duration_seconds", "SMTP delivery time per message", ["result"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+
+def route_template(app: ASGIApp, scope: Scope) -> str:
+    """The path template (e.g. /api/items/{item_id}) a request will be routed to.
+
+    Labels use the template, never the raw path, so ids don't blow up the
+    number of series.
+    """
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Record count, latency, in-flight requests and SQL usage per route template."""
+
+    def __init__(self, app: ASGIApp, router_app=None) -> None:
+        self.app = app
+        # The FastAPI app whose routes give the templates; set once it exists
+        self.router_app = router_app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.router_app, scope)
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = QueryStats(f"{method} {route}")
+        token = current_query_stats.set(stats)
+        in_flight = IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route, str(status)).inc()
+            REQUEST_QUERIES.labels(method, route).observe(stats.count)
+            REQUEST_DB_TIME.labels(method, route).observe(stats.seconds)
+            in_flight.dec()
+            current_query_stats.reset(token)
+
+
+def render_metrics() -> bytes:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_worker_stopped() -> None:
+    """Drop this worker's live gauges from the shared multiprocess files."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,112 @@
+"""Schema migrations (Alembic) and the startup schema check.
+
+    python migrate.py upgrade            # apply every pending revision
+    python migrate.py check              # compare the live schema with models.py
+    python migrate.py revision -m "..."  # start a new revision from the model diff
+    python migrate.py dedupe-reviews     # keep one review per user and item (needed by 0008)
+
+Any other Alembic command works through `alembic -c alembic.ini ...` as well.
+On Postgres, revisions build indexes with CREATE INDEX CONCURRENTLY, so
+upgrading a live database doesn't lock the tables against writes.
+"""
+import argparse
+import os
+from typing import List
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from database import engine
+from models import Base
+from migrations.helpers import include_object
+
+# "error" refuses to start on a schema mismatch, "warn" only logs it, "off" skips the check
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "error").lower()
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+def alembic_config() -> Config:
+    return Config(ALEMBIC_INI)
+
+
+def upgrade_database(revision: str = "head") -> None:
+    command.upgrade(alembic_config(), revision)
+
+
+def _describe(diff) -> str:
+    # Column changes come as a list of ("modify_*", schema, table, column, ...) tuples
+    if isinstance(diff, list):
+        _, _, table, column, *_ = diff[0]
+        return f"{', '.join(d[0] for d in diff)} on {table}.{column}"
+    kind, obj = diff[0], diff[-1] if diff[0].endswith("_column") else diff[1]
+    if kind.endswith("_column"):
+        return f"{kind} {diff[2]}.{obj.name}"
+    table = getattr(obj, "table", None)
+    return f"{kind} {obj.name}" + (f" on {table.name}" if table is not None else "")
+
+
+def schema_problems() -> List[str]:
+    """Ways the live database differs from the revisions and models in this checkout."""
+    heads = set(ScriptDirectory.from_config(alembic_config()).get_heads())
+    with engine.connect() as conn:
+        context = MigrationContext.configure(
+            conn, opts={"compare_type": True, "include_object": include_object}
+        )
+        current = set(context.get_current_heads())
+        problems = []
+        if current != heads:
+            problems.append(
+                f"database is at revision {', '.join(sorted(current)) or 'none'}, "
+                f"this code expects {', '.join(sorted(heads))}"
+            )
+        problems.extend(_describe(diff) for diff in compare_metadata(context, Base.metadata))
+    return problems
+
+
+def verify_schema() -> None:
+    """Run at startup: stop (or warn) when migrations haven't been applied."""
+    if SCHEMA_CHECK == "off":
+        return
+    problems = schema_problems()
+    if not problems:
+        return
+    message = "Schema does not match the models; run `python migrate.py upgrade`:\n  " + "\n  ".join(problems)
+    if SCHEMA_CHECK == "warn":
+        print(f"[Schema] {message}")
+        return
+    raise RuntimeError(message)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="action", required=True)
+    up = sub.add_parser("upgrade")
+    up.add_argument("revision", nargs="?", default="head")
+    sub.add_parser("check")
+    rev = sub.add_parser("revision")
+    rev.add_argument("-m", "--message", required=True)
+    sub.add_parser("dedupe-reviews")
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade_database(args.revision)
+    elif args.action == "revision":
+        command.revision(alembic_config(), message=args.message, autogenerate=True)
+    elif args.action == "dedupe-reviews":
+        from sqlalchemy.orm import Session
+        from ratings import remove_duplicate_reviews
+
+        with Session(engine) as db:
+            removed = remove_duplicate_reviews(db)
+            db.commit()
+        print(f"Removed {removed} duplicate reviews, keeping the first per user and item")
+    else:
+        problems = schema_problems()
+        for problem in problems:
+            print(problem)
+        print("Schema matches the models" if not problems else f"{len(problems)} difference(s)")
+        raise SystemExit(1 if problems else 0)
@@ -0,0 +1,54 @@
+import os
+import sys
+from logging.config import fileConfig
+
+from alembic import context
+
+# Run from anywhere: the app modules live one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DATABASE_URL, engine
+from models import Base
+from migrations.helpers import include_object
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+target_metadata = Base.metadata
+
+CONTEXT_OPTIONS = dict(
+    target_metadata=target_metadata,
+    include_object=include_object,
+    compare_type=True,
+    # Each revision commits on its own, so a CONCURRENTLY index build in a
+    # later revision doesn't sit inside an earlier one's transaction
+    transaction_per_migration=True,
+    # SQLite can't ALTER most things in place; batch mode rebuilds the table
+    render_as_batch=True,
+)
+
+
+def run_migrations_offline():
+    context.configure(url=DATABASE_URL, literal_binds=True, **CONTEXT_OPTIONS)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # migrate.py can hand over a connection it already holds
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, **CONTEXT_OPTIONS)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+    with engine.connect() as connection:
+        context.configure(connection=connection, **CONTEXT_OPTIONS)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,91 @@
+"""Shared pieces for revision scripts.
+
+Databases created before migrations existed were built with create_all from
+whatever models.py said at the time, so revisions skip tables, columns and
+indexes that are already there instead of failing on them.
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# Created by hand on Postgres only (see models.py), so never in the metadata
+UNMAPPED_OBJECTS = {("column", "search_vector"), ("index", "ix_items_search_vector")}
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Autogenerate/compare filter: ignore objects models.py deliberately doesn't map."""
+    return (type_, name) not in UNMAPPED_OBJECTS
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def has_table(table: str) -> bool:
+    return _inspector().has_table(table)
+
+
+def has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in _inspector().get_columns(table)}
+
+
+def has_index(table: str, name: str) -> bool:
+    return name in {i["name"] for i in _inspector().get_indexes(table)}
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def create_index(name: str, table: str, columns: Sequence[str], unique: bool = False) -> None:
+    """Create an index unless it exists, without blocking writes on Postgres.
+
+    CREATE INDEX CONCURRENTLY can't run in a transaction, so the revision's
+    transaction is committed first. A concurrent build that failed leaves an
+    INVALID index behind; it is dropped and rebuilt here.
+    """
+    if not _is_postgres():
+        if not has_index(table, name):
+            op.create_index(name, table, list(columns), unique=unique)
+        return
+    with op.get_context().autocommit_block():
+        valid = op.get_bind().execute(
+            sa.text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+            ),
+            {"name": name},
+        ).scalar()
+        if valid:
+            return
+        if valid is not None:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, list(columns), unique=unique, postgresql_concurrently=True)
+
+
+def drop_index(name: str, table: str) -> None:
+    if not has_index(table, name):
+        return
+    if _is_postgres():
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    else:
+        op.drop_index(name, table_name=table)
+
+
+RATING_COLUMNS = ("review_count", "rating_sum", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5")
+
+
+def recount_item_ratings() -> None:
+    """Recompute every item's rating aggregates from its reviews in one statement."""
+    per_star = ", ".join(
+        f"rating_{star} = (SELECT count(*) FROM reviews r WHERE r.item_id = items.id AND r.rating = {star})"
+        for star in range(1, 6)
+    )
+    op.execute(
+        "UPDATE items SET "
+        "review_count = (SELECT count(*) FROM reviews r WHERE r.item_id = items.id), "
+        "rating_sum = (SELECT coalesce(sum(r.rating), 0) FROM reviews r WHERE r.item_id = items.id), "
+        + per_star
+    )
@@ -0,0 +1,86 @@
+"""Baseline: users, items, reviews and orders as first deployed
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import has_table
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+SERVICE_TYPE = sa.Enum("DELIVERY", "IN_PERSON", name="servicetype")
+ORDER_STATUS = sa.Enum("PENDING", "CONFIRMED", "IN_PROGRESS", "COMPLETED", "CANCELLED", name="orderstatus")
+
+
+def upgrade():
+    if not has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(100), nullable=False),
+            sa.Column("email", sa.String(100), nullable=False),
+            sa.Column("password_hash", sa.String(255), nullable=False),
+            sa.Column("role", sa.String(20)),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if not has_table("items"):
+        op.create_table(
+            "items",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(100), nullable=False),
+            sa.Column("description", sa.Text()),
+            sa.Column("image_url", sa.String(255)),
+            sa.Column("price", sa.Float(), nullable=False),
+            sa.Column("category", sa.String(50), nullable=False),
+            sa.Column("stock_quantity", sa.Integer()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_items_id", "items", ["id"])
+
+    if not has_table("reviews"):
+        op.create_table(
+            "reviews",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("item_id", sa.Integer(), sa.ForeignKey("items.id"), nullable=False),
+            sa.Column("rating", sa.Integer(), nullable=False),
+            sa.Column("comment", sa.Text()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_reviews_id", "reviews", ["id"])
+
+    if not has_table("orders"):
+        op.create_table(
+            "orders",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("item_id", sa.Integer(), sa.ForeignKey("items.id"), nullable=False),
+            sa.Column("service_type", SERVICE_TYPE, nullable=False),
+            sa.Column("status", ORDER_STATUS),
+            sa.Column("quantity", sa.Integer()),
+            sa.Column("total_price", sa.Float(), nullable=False),
+            sa.Column("delivery_address", sa.Text()),
+            sa.Column("scheduled_time", sa.DateTime(timezone=True)),
+            sa.Column("mobile_number", sa.String(20)),
+            sa.Column("cancellation_reason", sa.Text()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_orders_id", "orders", ["id"])
+
+
+def downgrade():
+    op.drop_table("orders")
+    op.drop_table("reviews")
+    op.drop_table("items")
+    op.drop_table("users")
+    SERVICE_TYPE.drop(op.get_bind(), checkfirst=True)
+    ORDER_STATUS.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,34 @@
+"""Denormalised rating aggregates on items
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import RATING_COLUMNS, has_column, recount_item_ratings
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    added = False
+    for column in RATING_COLUMNS:
+        if not has_column("items", column):
+            op.add_column(
+                "items",
+                sa.Column(column, sa.Integer(), nullable=False, server_default="0"),
+            )
+            added = True
+    if added:
+        recount_item_ratings()
+
+
+def downgrade():
+    with op.batch_alter_table("items") as batch:
+        for column in RATING_COLUMNS:
+            batch.drop_column(column)
@@ -0,0 +1,46 @@
+"""Multi-line orders: order_lines, and orders.item_id only for single-item orders
+
+Orders placed before this keep their item_id/quantity and no lines;
+Order.line_quantities and the sales rollups read them that way.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import has_table
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not has_table("order_lines"):
+        op.create_table(
+            "order_lines",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+            sa.Column("item_id", sa.Integer(), sa.ForeignKey("items.id"), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("unit_price", sa.Float(), nullable=False),
+            sa.Column("line_total", sa.Float(), nullable=False),
+        )
+        op.create_index("ix_order_lines_id", "order_lines", ["id"])
+        op.create_index("ix_order_lines_order_id", "order_lines", ["order_id"])
+
+    nullable = {c["name"]: c["nullable"] for c in sa.inspect(op.get_bind()).get_columns("orders")}
+    if not nullable["item_id"]:
+        with op.batch_alter_table("orders") as batch:
+            batch.alter_column("item_id", existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade():
+    op.drop_table("order_lines")
+    # Cart orders have no item_id to restore
+    op.execute("DELETE FROM orders WHERE item_id IS NULL")
+    with op.batch_alter_table("orders") as batch:
+        batch.alter_column("item_id", existing_type=sa.Integer(), nullable=False)
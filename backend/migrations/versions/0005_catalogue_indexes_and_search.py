@@ -0,0 +1,55 @@
+"""Keyset pagination indexes for the catalogue and Postgres full-text search
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+from migrations.helpers import create_index, drop_index, has_column
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+KEYSET_INDEXES = {
+    "ix_items_created_at_id": ["created_at", "id"],
+    "ix_items_price_id": ["price", "id"],
+    "ix_items_category_created_at_id": ["category", "created_at", "id"],
+    "ix_items_category_price_id": ["category", "price", "id"],
+}
+
+# Same expression as models.ITEM_SEARCH_VECTOR_SQL when this revision was written
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
+
+def upgrade():
+    for name, columns in KEYSET_INDEXES.items():
+        create_index(name, "items", columns)
+
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    if not has_column("items", "search_vector"):
+        # Adding a stored generated column rewrites the table under a lock;
+        # run this revision in a quiet period on a large catalogue
+        op.execute(
+            f"ALTER TABLE items ADD COLUMN search_vector tsvector "
+            f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+        )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_search_vector "
+            "ON items USING GIN (search_vector)"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        drop_index("ix_items_search_vector", "items")
+        op.execute("ALTER TABLE items DROP COLUMN IF EXISTS search_vector")
+    for name in KEYSET_INDEXES:
+        drop_index(name, "items")
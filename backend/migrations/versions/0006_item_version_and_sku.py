@@ -0,0 +1,35 @@
+"""Row version for ETags and the supplier SKU used by bulk imports
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_index, drop_index, has_column
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not has_column("items", "version"):
+        op.add_column("items", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+    if not has_column("items", "sku"):
+        op.add_column("items", sa.Column("sku", sa.String(64)))
+    # Databases created from models.py before this revision got a unique
+    # constraint instead of the unique index; keep just the index
+    for constraint in sa.inspect(op.get_bind()).get_unique_constraints("items"):
+        if constraint["column_names"] == ["sku"] and constraint["name"]:
+            op.drop_constraint(constraint["name"], "items", type_="unique")
+    create_index("ix_items_sku", "items", ["sku"], unique=True)
+
+
+def downgrade():
+    drop_index("ix_items_sku", "items")
+    with op.batch_alter_table("items") as batch:
+        batch.drop_column("sku")
+        batch.drop_column("version")
@@ -0,0 +1,63 @@
+"""Indexes for the per-user, per-status and per-item listings; one review per user and item
+
+The route already refuses a second review, but two concurrent requests could
+both get through. The upgrade stops and lists any such duplicates rather than
+choosing which to delete; `python migrate.py dedupe-reviews` keeps the first
+of each, after which the upgrade can be run again.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_index, drop_index
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+# Duplicate (user, item) pairs shown in the error; the count covers the rest
+SHOWN_DUPLICATES = 20
+
+INDEXES = [
+    ("ix_orders_user_id_created_at", "orders", ["user_id", "created_at"]),
+    ("ix_orders_status_created_at", "orders", ["status", "created_at"]),
+    ("ix_reviews_item_id_created_at", "reviews", ["item_id", "created_at"]),
+]
+
+
+def _refuse_duplicate_reviews():
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT user_id, item_id, count(*) FROM reviews "
+        "GROUP BY user_id, item_id HAVING count(*) > 1 ORDER BY user_id, item_id"
+    )).all()
+    if not duplicates:
+        return
+    listed = "\n  ".join(
+        f"user {user_id}, item {item_id}: {count} reviews"
+        for user_id, item_id, count in duplicates[:SHOWN_DUPLICATES]
+    )
+    if len(duplicates) > SHOWN_DUPLICATES:
+        listed += f"\n  ... and {len(duplicates) - SHOWN_DUPLICATES} more"
+    raise RuntimeError(
+        f"The unique index on reviews (user_id, item_id) can't be built; "
+        f"{len(duplicates)} user/item pairs have more than one review:\n  {listed}\n"
+        "Run `python migrate.py dedupe-reviews` to keep the first review of each, "
+        "then upgrade again."
+    )
+
+
+def upgrade():
+    _refuse_duplicate_reviews()
+    for name, table, columns in INDEXES:
+        create_index(name, table, columns)
+    create_index("uq_reviews_user_id_item_id", "reviews", ["user_id", "item_id"], unique=True)
+
+
+def downgrade():
+    drop_index("uq_reviews_user_id_item_id", "reviews")
+    for name, table, _ in reversed(INDEXES):
+        drop_index(name, table)
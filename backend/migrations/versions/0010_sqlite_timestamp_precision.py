@@ -0,0 +1,42 @@
+"""Pad whole-second SQLite timestamps to the layout bound values use
+
+SQLite stores datetimes as text. Values written by CURRENT_TIMESTAMP, and
+earlier by a whole-second storage format, lack the ".ffffff" part that
+SQLAlchemy writes, so they sort before a bound value from the same second
+and keyset cursors skip rows. Padding them changes no instant. Other
+databases store real timestamps and are left alone.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+TIMESTAMP_COLUMNS = [
+    ("users", "created_at"),
+    ("items", "created_at"),
+    ("orders", "created_at"),
+    ("reviews", "created_at"),
+    ("idempotency_keys", "created_at"),
+    ("idempotency_keys", "expires_at"),
+    ("email_outbox", "next_attempt_at"),
+    ("email_outbox", "created_at"),
+    ("email_outbox", "sent_at"),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table, column in TIMESTAMP_COLUMNS:
+        op.execute(f"UPDATE {table} SET {column} = {column} || '.000000' WHERE length({column}) = 19")
+
+
+def downgrade():
+    # The padded values read back as the same datetimes
+    pass
@@ -1,9 +1,37 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Enum, Index, UniqueConstraint, DDL, event
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
+from sqlalchemy.sql.expression import FunctionElement
 from database import Base
 import enum
 
+Timestamp = DateTime(timezone=True)
+
+
+class utcnow(FunctionElement):
+    """Insert-time default for Timestamp columns.
+
+    SQLite keeps datetimes as text, and its CURRENT_TIMESTAMP has no
+    fractional part while bound values carry microseconds, so the two sort
+    inconsistently (and break (created_at, id) keysets). On SQLite this
+    renders the current time in the bound values' layout instead; elsewhere
+    it is plain now(). The server_default stays for rows inserted by hand.
+    """
+    type = Timestamp
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow(element, compiler, **kw):
+    return compiler.process(func.now(), **kw)
+
+
+@compiles(utcnow, "sqlite")
+def _utcnow_sqlite(element, compiler, **kw):
+    # %f is seconds with milliseconds; pad to the six digits bound values use
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
 class ServiceType(enum.Enum):
     DELIVERY = "delivery"
     IN_PERSON = "in_person"
@@ -15,6 +43,11 @@ class OrderStatus(enum.Enum):
     COMPLETED = "completed"
     CANCELLED = "cancelled"
 
+class EmailStatus(enum.Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
 class User(Base):
     __tablename__ = "users"
     
@@ -23,7 +56,7 @@ class User(Base):
     email = Column(String(100), unique=True, index=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
     role = Column(String(20), default="customer")  # customer, admin
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, default=utcnow(), server_default=func.now())
     
     # Relationships
     reviews = relationship("Review", back_populates="user")
@@ -33,18 +66,68 @@ class Item(Base):
     __tablename__ = "items"
     
     id = Column(Integer, primary_key=True, index=True)
+    sku = Column(String(64), index=True, unique=True)  # Supplier SKU, the key for bulk imports
     name = Column(String(100), nullable=False)
     description = Column(Text)
     image_url = Column(String(255))
     price = Column(Float, nullable=False)
     category = Column(String(50), nullable=False)  # fruits, dairy, beverages, etc.
     stock_quantity = Column(Integer, default=0)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, default=utcnow(), server_default=func.now())
+
+    # Rating aggregates, maintained alongside reviews (see ratings.py)
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_1 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_2 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_3 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_4 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_5 = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Bumped by every UPDATE, ORM or Core, so ETags can tell a row changed
+    version = Column(
+        Integer, nullable=False, default=1, server_default="1",
+        onupdate=literal_column("version") + 1
+    )
     
     # Relationships
     reviews = relationship("Review", back_populates="item")
     orders = relationship("Order", back_populates="item")
 
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f"rating_{star}") or 0 for star in range(1, 6)}
+
+    # Keyset pagination indexes for the catalogue listing
+    __table_args__ = (
+        Index("ix_items_created_at_id", "created_at", "id"),
+        Index("ix_items_price_id", "price", "id"),
+        Index("ix_items_category_created_at_id", "category", "created_at", "id"),
+        Index("ix_items_category_price_id", "category", "price", "id"),
+    )
+
+# On Postgres, items also carry a generated tsvector for full-text search
+# (see search.py). It isn't mapped so the model stays portable to SQLite.
+ITEM_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+event.listen(
+    Item.__table__,
+    "after_create",
+    DDL(
+        f"ALTER TABLE items ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({ITEM_SEARCH_VECTOR_SQL}) STORED; "
+        "CREATE INDEX ix_items_search_vector ON items USING GIN (search_vector)"
+    ).execute_if(dialect="postgresql")
+)
+
 class Review(Base):
     __tablename__ = "reviews"
     
@@ -53,28 +136,127 @@ class Review(Base):
     item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
     rating = Column(Integer, nullable=False)  # 1-5 stars
     comment = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, default=utcnow(), server_default=func.now())
     
     # Relationships
     user = relationship("User", back_populates="reviews")
     item = relationship("Item", back_populates="reviews")
 
+    __table_args__ = (
+        Index("ix_reviews_item_id_created_at", "item_id", "created_at"),
+        Index("uq_reviews_user_id_item_id", "user_id", "item_id", unique=True),
+    )
+
 class Order(Base):
     __tablename__ = "orders"
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    item_id = Column(Integer, ForeignKey("items.id"))  # Single-item orders; carts use lines
     service_type = Column(Enum(ServiceType), nullable=False)
     status = Column(Enum(OrderStatus), default=OrderStatus.PENDING)
-    quantity = Column(Integer, default=1)
+    quantity = Column(Integer, default=1)  # Total units across all lines
     total_price = Column(Float, nullable=False)
     delivery_address = Column(Text)  # For delivery orders
     scheduled_time = Column(DateTime(timezone=True))  # For in-person services
     mobile_number = Column(String(20))  # New field
     cancellation_reason = Column(Text)  # New field
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, default=utcnow(), server_default=func.now())
     
     # Relationships
     user = relationship("User", back_populates="orders")
-    item = relationship("Item", back_populates="orders") 
\ No newline at end of file
+    item = relationship("Item", back_populates="orders")
+    lines = relationship("OrderLine", back_populates="order", order_by="OrderLine.id")
+
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+        Index("ix_orders_status_created_at", "status", "created_at"),
+    )
+
+    @property
+    def line_quantities(self):
+        """Units per item; falls back to item_id/quantity for orders without lines."""
+        if self.lines:
+            quantities = {}
+            for line in self.lines:
+                quantities[line.item_id] = quantities.get(line.item_id, 0) + line.quantity
+            return quantities
+        return {self.item_id: self.quantity}
+
+class OrderLine(Base):
+    __tablename__ = "order_lines"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)
+    line_total = Column(Float, nullable=False)
+
+    # Relationships
+    order = relationship("Order", back_populates="lines")
+    item = relationship("Item")
+
+class IdempotencyKey(Base):
+    """A client's Idempotency-Key and the response its first request produced (see idempotency.py)."""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # Same key with a different body is refused
+    order_id = Column(Integer, ForeignKey("orders.id"))
+    status_code = Column(Integer)
+    response_body = Column(Text)
+    created_at = Column(Timestamp, default=utcnow(), server_default=func.now())
+    expires_at = Column(Timestamp, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_id_key"),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+class SalesDaily(Base):
+    """Order totals per UTC day, status and service type (see sales.py)."""
+    __tablename__ = "sales_daily"
+
+    day = Column(Date, primary_key=True)
+    status = Column(Enum(OrderStatus), primary_key=True)
+    service_type = Column(Enum(ServiceType), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class SalesDailyCategory(Base):
+    """Line totals per UTC day, item category, status and service type.
+
+    ``order_count`` counts orders with at least one line in the category, so
+    a cart spanning two categories is counted under both.
+    """
+    __tablename__ = "sales_daily_category"
+
+    day = Column(Date, primary_key=True)
+    category = Column(String(50), primary_key=True)
+    status = Column(Enum(OrderStatus), primary_key=True)
+    service_type = Column(Enum(ServiceType), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(Enum(EmailStatus), nullable=False, default=EmailStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(Timestamp, default=utcnow(), server_default=func.now())
+    last_error = Column(Text)
+    created_at = Column(Timestamp, default=utcnow(), server_default=func.now())
+    sent_at = Column(Timestamp)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
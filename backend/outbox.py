@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+from database import SessionLocal
+from email_utils import SMTPSender
+from models import EmailOutbox, EmailStatus
+
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "30"))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "3600"))
+# How long a worker owns the messages it claimed; must comfortably exceed a batch's sends
+OUTBOX_CLAIM_SECONDS = float(os.getenv("OUTBOX_CLAIM_SECONDS", "300"))
+# Keep the SMTP session open this long after the last send so bursts share it
+OUTBOX_SMTP_IDLE_SECONDS = float(os.getenv("OUTBOX_SMTP_IDLE_SECONDS", "60"))
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff after the given number of failed attempts."""
+    seconds = OUTBOX_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(seconds, OUTBOX_MAX_BACKOFF_SECONDS))
+
+
+class OutboxWorker:
+    """Background thread that drains the email outbox over a shared SMTP connection."""
+
+    def __init__(self, session_factory=SessionLocal, sender=None):
+        self.session_factory = session_factory
+        self.sender = sender or SMTPSender()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_send = 0.0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.sender.close()
+
+    def wake(self):
+        """Deliver newly committed messages now instead of at the next poll."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception as e:
+                print(f"[Email] Outbox batch failed: {e}")
+                processed = 0
+            if processed:
+                self._last_send = time.monotonic()
+            if processed < OUTBOX_BATCH_SIZE:
+                if time.monotonic() - self._last_send > OUTBOX_SMTP_IDLE_SECONDS:
+                    self.sender.close()
+                self._wake.wait(OUTBOX_POLL_INTERVAL)
+                self._wake.clear()
+
+    def _claim(self) -> List[Tuple[int, str, str, str, int]]:
+        """Lease up to OUTBOX_BATCH_SIZE due messages in one short transaction.
+
+        Claimed rows get ``next_attempt_at`` pushed OUTBOX_CLAIM_SECONDS ahead,
+        so other workers skip them while this one sends; if it dies mid-batch
+        the unsent ones become due again when the lease runs out.
+        """
+        db = self.session_factory()
+        try:
+            now = datetime.now(timezone.utc)
+            # SKIP LOCKED lets several worker processes share the outbox
+            messages = (
+                db.query(EmailOutbox)
+                .filter(
+                    EmailOutbox.status == EmailStatus.PENDING,
+                    EmailOutbox.next_attempt_at <= now
+                )
+                .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+                .limit(OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            claimed = []
+            for message in messages:
+                message.next_attempt_at = now + timedelta(seconds=OUTBOX_CLAIM_SECONDS)
+                claimed.append((message.id, message.recipient, message.subject, message.body, message.attempts))
+            db.commit()
+            return claimed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _record(self, message_id: int, **values) -> None:
+        """Commit one message's outcome on its own, so it sticks whatever happens next."""
+        db = self.session_factory()
+        try:
+            db.query(EmailOutbox).filter(EmailOutbox.id == message_id).update(
+                values, synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def process_batch(self) -> int:
+        """Send up to OUTBOX_BATCH_SIZE due messages. Returns how many were attempted.
+
+        No transaction is open while talking to the SMTP server.
+        """
+        claimed = self._claim()
+        for message_id, recipient, subject, body, attempts in claimed:
+            attempts += 1
+            try:
+                self.sender.send(recipient, subject, body)
+            except Exception as e:
+                # Whatever went wrong, it is this message's failure, not the batch's
+                self.sender.close()
+                if attempts >= OUTBOX_MAX_ATTEMPTS:
+                    self._record(message_id, attempts=attempts, last_error=str(e), status=EmailStatus.FAILED)
+                    print(f"[Email] Giving up on message {message_id} to {recipient}: {e}")
+                else:
+                    self._record(
+                        message_id,
+                        attempts=attempts,
+                        last_error=str(e),
+                        next_attempt_at=datetime.now(timezone.utc) + retry_delay(attempts)
+                    )
+                    print(f"[Email] Failed to send message {message_id}, retrying: {e}")
+            else:
+                self._record(
+                    message_id, attempts=attempts, status=EmailStatus.SENT, sent_at=datetime.now(timezone.utc)
+                )
+                print(f"[Email] Sent '{subject}' to {recipient}")
+        return len(claimed)
+
+
+outbox_worker = OutboxWorker()
@@ -0,0 +1,33 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+def encode_cursor(sort: str, value: Any, last_id: int) -> str:
+    """Build an opaque keyset cursor pointing just past (value, last_id)."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps({"s": sort, "v": value, "i": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(
+    cursor: str, sort: str, parse: Optional[Callable[[Any], Any]] = None
+) -> Tuple[Any, int]:
+    """Decode a cursor made by encode_cursor for the same sort key."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if data["s"] != sort:
+            raise ValueError("cursor was issued for a different sort order")
+        value = parse(data["v"]) if parse and data["v"] is not None else data["v"]
+        return value, int(data["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid cursor: {e}"
+        )
+
+def parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value)
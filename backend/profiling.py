@@ -0,0 +1,120 @@
+"""Opt-in SQL profiling: slow-statement log with EXPLAIN plans, and timing headers.
+
+Both are off by default:
+
+- SQL_SLOW_QUERY_MS: log every statement slower than this many milliseconds,
+  tagged with the request it ran for and, with SQL_EXPLAIN_SLOW, its plan.
+- SQL_PROFILE_HEADERS: add ``X-Query-Count`` and ``Server-Timing`` to every
+  response, so the browser's network tab shows where the time went.
+
+Per-request totals come from the QueryStats the metrics middleware keeps in
+``database.current_query_stats``.
+"""
+import os
+import time
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from database import QueryStats, async_engine, current_query_stats, engine
+
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "0"))
+SQL_EXPLAIN_SLOW = os.getenv("SQL_EXPLAIN_SLOW", "True").lower() == "true"
+SQL_PROFILE_HEADERS = os.getenv("SQL_PROFILE_HEADERS", "False").lower() == "true"
+
+_EXPLAINABLE = ("select", "insert", "update", "delete", "with")
+
+
+def _explain(conn, statement: str, parameters, dialect: str) -> str:
+    """Plan for ``statement`` from the connection that just ran it.
+
+    EXPLAIN without ANALYZE doesn't execute anything. On Postgres it runs
+    inside a savepoint so a failure can't abort the request's transaction.
+    """
+    if dialect == "sqlite":
+        prefix, savepoint = "EXPLAIN QUERY PLAN ", False
+    elif dialect == "postgresql":
+        prefix, savepoint = "EXPLAIN ", True
+    else:
+        return "(EXPLAIN not supported for this database)"
+
+    # A raw cursor on the same DBAPI connection: same driver paramstyle, and
+    # no cursor events fired for the EXPLAIN itself
+    explain_cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            explain_cursor.execute("SAVEPOINT sql_profile_explain")
+        try:
+            explain_cursor.execute(prefix + statement, parameters)
+            rows = explain_cursor.fetchall()
+        except Exception as e:
+            if savepoint:
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT sql_profile_explain")
+            return f"(EXPLAIN failed: {e})"
+        if savepoint:
+            explain_cursor.execute("RELEASE SAVEPOINT sql_profile_explain")
+    finally:
+        explain_cursor.close()
+    # Postgres gives one text column per plan line; SQLite (id, parent, notused, detail)
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def _log_slow_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._query_started) * 1000
+    if elapsed_ms < SQL_SLOW_QUERY_MS:
+        return
+    stats = current_query_stats.get()
+    where = stats.label if stats is not None and stats.label else "background"
+    print(f"[SQL] Slow statement ({elapsed_ms:.1f} ms, {where}): {statement}")
+    if SQL_EXPLAIN_SLOW and not executemany and statement.lstrip().lower().startswith(_EXPLAINABLE):
+        plan = _explain(conn, statement, parameters, conn.dialect.name)
+        print("[SQL] Plan:\n" + plan)
+
+
+def enable_slow_query_log() -> None:
+    for target in filter(None, (engine, async_engine and async_engine.sync_engine)):
+        # Registered after database.py's own hooks, so the start time is set
+        event.listen(target, "after_cursor_execute", _log_slow_statement)
+
+
+if SQL_SLOW_QUERY_MS > 0:
+    enable_slow_query_log()
+
+
+class QueryTimingMiddleware:
+    """Add ``X-Query-Count`` and ``Server-Timing`` headers for the request's SQL."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = None
+        stats = current_query_stats.get()
+        if stats is None:
+            stats = QueryStats()
+            token = current_query_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Streamed bodies keep querying after this; headers show the work up to here
+                total_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers["X-Query-Count"] = str(stats.count)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries", '
+                    f"app;dur={total_ms:.2f}"
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if token is not None:
+                current_query_stats.reset(token)
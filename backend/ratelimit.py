@@ -0,0 +1,264 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from auth import verify_token
+from cache import CACHE_KEY_PREFIX, CACHE_REDIS_URL
+from metrics import LOAD_SHED, RATE_LIMITED, route_template
+
+# Per-route token buckets: "METHOD /route/template=scope:requests/seconds,...;..."
+# where scope is "ip" or "user" (the bearer token's user; skipped when anonymous).
+# Each bucket holds `requests` tokens and refills them evenly over `seconds`.
+RATE_LIMITS = os.getenv(
+    "RATE_LIMITS",
+    "POST /api/auth/login=ip:10/60;"
+    "POST /api/auth/register=ip:5/60;"
+    "POST /api/auth/password/forgot=ip:5/300;"
+    "POST /api/auth/password/reset=ip:10/300;"
+    "POST /api/orders/=ip:60/60,user:20/60;"
+    "POST /api/orders/checkout=ip:60/60,user:20/60"
+)
+# "memory" keeps buckets per worker process, "redis" shares them between
+# workers, "none" turns rate limiting off
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", CACHE_REDIS_URL)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Requests in flight (per worker) beyond which new ones get 503; 0 disables shedding
+LOAD_SHED_MAX_IN_FLIGHT = int(os.getenv("LOAD_SHED_MAX_IN_FLIGHT", "256"))
+LOAD_SHED_RETRY_AFTER = int(os.getenv("LOAD_SHED_RETRY_AFTER", "1"))
+# Never shed or limit these, so probes and scrapes keep working under load
+LOAD_SHED_EXEMPT_PREFIXES = ("/health", "/metrics")
+# Route templates whose responses stay open and mostly idle (event streams);
+# they'd fill the in-flight watermark on their own, so they're neither counted
+# nor shed by it (the stream itself caps connections)
+LOAD_SHED_STREAMING_ROUTES = frozenset({"/api/orders/events"})
+
+
+class Limit(NamedTuple):
+    scope: str
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+
+def parse_limits(spec: str) -> Dict[str, List[Limit]]:
+    """Parse a RATE_LIMITS string into {"METHOD /template": [Limit, ...]}."""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        route, _, rules = entry.rpartition("=")
+        method, _, path = route.strip().partition(" ")
+        parsed = []
+        for rule in filter(None, (part.strip() for part in rules.split(","))):
+            scope, _, amount = rule.partition(":")
+            requests, _, seconds = amount.partition("/")
+            if scope not in ("ip", "user") or not requests or not seconds:
+                raise ValueError(f"Bad rate limit rule {rule!r} for {route.strip()!r}")
+            parsed.append(Limit(scope, int(requests), float(seconds)))
+        limits[f"{method.upper()} {path.strip()}"] = parsed
+    return limits
+
+
+class MemoryBuckets:
+    """Token buckets for this worker process, least recently used dropped first."""
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit) -> float:
+        """Take one token; returns 0 when allowed, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (limit.capacity, now))
+            tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / limit.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+# Refill and take in one round trip; Redis' clock keeps every worker consistent
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    """Token buckets shared by every worker process through Redis."""
+
+    name = "redis"
+    blocking = True
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the 'redis' package installed")
+            client = redis.Redis.from_url(url, socket_timeout=1)
+        self.client = client
+        self._take = client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key: str, limit: Limit) -> float:
+        return float(self._take(keys=[f"{CACHE_KEY_PREFIX}rl:{key}"], args=[limit.capacity, limit.rate]))
+
+
+def client_ip(scope: Scope) -> str:
+    """The peer address, never a client-supplied header.
+
+    Behind a proxy, uvicorn's proxy_headers (see serve.py) has already
+    replaced it with the address the trusted FORWARDED_ALLOW_IPS hops report.
+    """
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def token_user(headers: Headers) -> Optional[str]:
+    """The user a bearer token belongs to, without touching the database."""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        claims = verify_token(token, HTTPException(status_code=401))
+    except HTTPException:
+        # Bad tokens are rejected by the route itself; limit them by IP only
+        return None
+    return str(claims.user_id or claims.email)
+
+
+def _json_response(status: int, detail: str, retry_after: float):
+    body = orjson.dumps({"detail": detail})
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+    ]
+    return status, headers, body
+
+
+class RateLimitMiddleware:
+    """Token-bucket limits per route and client, plus in-flight load shedding.
+
+    Over a limit the request gets 429 with Retry-After before it reaches the
+    route. With more than LOAD_SHED_MAX_IN_FLIGHT requests already running in
+    this worker, new ones get 503 straight away rather than queueing behind
+    them.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        router_app=None,
+        limits: Optional[Dict[str, List[Limit]]] = None,
+        buckets=None,
+        max_in_flight: int = LOAD_SHED_MAX_IN_FLIGHT
+    ) -> None:
+        self.app = app
+        self.router_app = router_app
+        self.limits = parse_limits(RATE_LIMITS) if limits is None else limits
+        self.buckets = _make_buckets() if buckets is None else buckets
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    async def _retry_after(self, scope: Scope, route: str) -> float:
+        """0 when every bucket for this request had a token, else the longest wait."""
+        limits = self.limits.get(f"{scope['method']} {route}")
+        if not limits or self.buckets is None:
+            return 0.0
+        headers = Headers(scope=scope)
+        subjects = {"ip": client_ip(scope), "user": token_user(headers)}
+        wait = 0.0
+        for limit in limits:
+            subject = subjects[limit.scope]
+            if subject is None:
+                continue
+            key = f"{scope['method']} {route}|{limit.scope}:{subject}"
+            try:
+                if self.buckets.blocking:
+                    waited = await run_in_threadpool(self.buckets.take, key, limit)
+                else:
+                    waited = self.buckets.take(key, limit)
+            except Exception as e:
+                # A limiter outage must not turn into an API outage
+                print(f"[RateLimit] Bucket check failed: {e}")
+                return 0.0
+            if waited:
+                RATE_LIMITED.labels(route, limit.scope).inc()
+                wait = max(wait, waited)
+        return wait
+
+    async def _reject(self, send: Send, status: int, detail: str, retry_after: float) -> None:
+        status, headers, body = _json_response(status, detail, retry_after)
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(LOAD_SHED_EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        route = route_template(self.router_app, scope)
+        streaming = route in LOAD_SHED_STREAMING_ROUTES
+        if not streaming and self.max_in_flight and self.in_flight >= self.max_in_flight:
+            LOAD_SHED.labels(route).inc()
+            await self._reject(send, 503, "Server busy, please retry shortly", LOAD_SHED_RETRY_AFTER)
+            return
+
+        retry_after = await self._retry_after(scope, route)
+        if retry_after:
+            await self._reject(send, 429, "Too many requests, please retry later", retry_after)
+            return
+
+        if streaming:
+            await self.app(scope, receive, send)
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+
+def _make_buckets():
+    if RATE_LIMIT_BACKEND == "none":
+        return None
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisBuckets()
+    return MemoryBuckets()
@@ -0,0 +1,102 @@
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import Session
+from typing import Iterable, Optional
+
+from models import Item, Review
+
+RATING_COLUMNS = {
+    1: Item.rating_1,
+    2: Item.rating_2,
+    3: Item.rating_3,
+    4: Item.rating_4,
+    5: Item.rating_5,
+}
+
+def record_review_rating(db: Session, item_id: int, rating: int) -> None:
+    """Fold a new review into the item's aggregates.
+
+    Issued as a single UPDATE with relative increments so concurrent reviews
+    never overwrite each other; commits with the caller's transaction.
+    """
+    column = RATING_COLUMNS[rating]
+    db.query(Item).filter(Item.id == item_id).update(
+        {
+            Item.review_count: Item.review_count + 1,
+            Item.rating_sum: Item.rating_sum + rating,
+            column: column + 1,
+        },
+        synchronize_session=False,
+    )
+
+def recompute_item_ratings(db: Session, item_ids: Optional[Iterable[int]] = None) -> int:
+    """Rebuild rating aggregates from the reviews table. Returns items updated.
+
+    Two set-based statements whatever the catalogue size: zero the targeted
+    items, then fold in per-item totals with UPDATE ... FROM. Runs in the
+    caller's transaction; the caller commits.
+    """
+    targets = None if item_ids is None else list(item_ids)
+
+    reset = update(Item).values(
+        {Item.review_count: 0, Item.rating_sum: 0, **{column: 0 for column in RATING_COLUMNS.values()}}
+    )
+    if targets is not None:
+        reset = reset.where(Item.id.in_(targets))
+    updated = db.execute(reset, execution_options={"synchronize_session": False}).rowcount
+
+    totals = select(
+        Review.item_id.label("item_id"),
+        func.count(Review.id).label("review_count"),
+        func.coalesce(func.sum(Review.rating), 0).label("rating_sum"),
+        *(
+            func.sum(case((Review.rating == star, 1), else_=0)).label(f"rating_{star}")
+            for star in RATING_COLUMNS
+        ),
+    ).group_by(Review.item_id)
+    if targets is not None:
+        totals = totals.where(Review.item_id.in_(targets))
+    totals = totals.subquery()
+
+    db.execute(
+        update(Item)
+        .where(Item.id == totals.c.item_id)
+        .values(
+            {
+                Item.review_count: totals.c.review_count,
+                Item.rating_sum: totals.c.rating_sum,
+                **{column: totals.c[f"rating_{star}"] for star, column in RATING_COLUMNS.items()},
+            }
+        ),
+        execution_options={"synchronize_session": False},
+    )
+    return updated
+
+def remove_duplicate_reviews(db: Session) -> int:
+    """Delete all but the first review per user and item. Returns reviews removed.
+
+    Needed once before revision 0008 adds the unique index on (user_id, item_id);
+    the affected items' aggregates are recomputed. The caller commits.
+    """
+    first = select(func.min(Review.id)).group_by(Review.user_id, Review.item_id)
+    item_ids = db.scalars(select(Review.item_id).where(Review.id.not_in(first)).distinct()).all()
+    if not item_ids:
+        return 0
+    removed = db.execute(
+        delete(Review).where(Review.id.not_in(first)),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    recompute_item_ratings(db, item_ids)
+    return removed
+
+if __name__ == "__main__":
+    import sys
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        ids = [int(arg) for arg in sys.argv[1:]] or None
+        updated = recompute_item_ratings(db, ids)
+        db.commit()
+        print(f"Recomputed rating aggregates for {updated} items")
+    finally:
+        db.close()
@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import List, Literal, Optional
+
+from database import get_db, run_db
+from models import OrderStatus, ServiceType, SalesDaily, SalesDailyCategory
+from schemas import CurrentUser, SalesRow
+from auth import get_current_user
+
+router = APIRouter()
+
+SalesDimension = Literal["day", "category", "status", "service_type"]
+
+def _sales_report(
+    db: Session,
+    group_by: List[str],
+    day_from: Optional[date],
+    day_to: Optional[date],
+    order_status: Optional[OrderStatus],
+    service_type: Optional[ServiceType],
+    category: Optional[str]
+) -> List[SalesRow]:
+    # Per-category rows only when the category matters; summing them would
+    # count a mixed cart once per category
+    model = SalesDailyCategory if "category" in group_by or category else SalesDaily
+    dimensions = list(dict.fromkeys(group_by))
+    columns = [getattr(model, dimension) for dimension in dimensions]
+    query = db.query(
+        *columns,
+        func.sum(model.order_count),
+        func.sum(model.units),
+        func.sum(model.revenue)
+    )
+
+    if day_from is not None:
+        query = query.filter(model.day >= day_from)
+    if day_to is not None:
+        query = query.filter(model.day <= day_to)
+    if order_status is not None:
+        query = query.filter(model.status == order_status)
+    if service_type is not None:
+        query = query.filter(model.service_type == service_type)
+    if category:
+        query = query.filter(model.category == category)
+
+    # Status changes leave zeroed rows behind; don't report them
+    query = query.group_by(*columns).having(func.sum(model.order_count) != 0).order_by(*columns)
+    return [
+        SalesRow(
+            **dict(zip(dimensions, row)),
+            orders=row[-3],
+            units=row[-2],
+            revenue=round(row[-1], 2)
+        )
+        for row in query
+    ]
+
+@router.get("/sales", response_model=List[SalesRow])
+async def get_sales(
+    group_by: List[SalesDimension] = Query(["day"]),
+    day_from: Optional[date] = None,
+    day_to: Optional[date] = None,
+    status: Optional[OrderStatus] = None,
+    service_type: Optional[ServiceType] = None,
+    category: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Admin: Revenue, units and order counts from the daily sales rollups.
+
+    Repeat ``group_by`` to break totals down by several of day, category,
+    status and service type; ``day_from``/``day_to`` are inclusive UTC days.
+    Grouped by category, ``orders`` counts orders with a line in it.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return await run_db(
+        db, _sales_report, group_by, day_from, day_to, status, service_type, category
+    )
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import timedelta
 
-from database import get_db
+from database import get_db, run_db
 from models import User
 from schemas import (
     UserCreate,
@@ -13,34 +13,31 @@ from schemas import (
     PasswordResetConfirm,
 )
 from auth import (
-    get_password_hash,
+    hash_password_async,
     authenticate_user,
+    get_user_by_email,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     create_password_reset_token,
     verify_password_reset_token,
 )
-from email_utils import EMAIL_USER, EMAIL_PASS, EMAIL_HOST, EMAIL_PORT
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email_utils import queue_password_reset_email
+from outbox import outbox_worker
 import os
 
 router = APIRouter()
 
-@router.post("/register", response_model=UserSchema)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    """Register a new user."""
+def _ensure_email_available(db: Session, email: str) -> None:
     # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = db.query(User).filter(User.email == email).first()
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    
+
+def _register(db: Session, user: UserCreate, hashed_password: str) -> User:
     # Create new user
-    hashed_password = get_password_hash(user.password)
     db_user = User(
         name=user.name,
         email=user.email,
@@ -53,10 +50,17 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     
     return db_user
 
+@router.post("/register", response_model=UserSchema)
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    """Register a new user."""
+    await run_db(db, _ensure_email_available, user.email)
+    hashed_password = await hash_password_async(user.password)
+    return await run_db(db, _register, user, hashed_password)
+
 @router.post("/login", response_model=Token)
-def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     """Login user and return access token."""
-    user = authenticate_user(db, user_credentials.email, user_credentials.password)
+    user = await authenticate_user(db, user_credentials.email, user_credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -71,57 +75,38 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     
     return {"access_token": access_token, "token_type": "bearer"} 
 
-@router.post("/password/forgot")
-def forgot_password(payload: PasswordResetRequest, db: Session = Depends(get_db)):
-    """Generate a password reset link and email it to the user (if exists)."""
-    user = db.query(User).filter(User.email == payload.email).first()
+def _queue_reset_email(db: Session, email: str) -> None:
+    user = get_user_by_email(db, email)
     # Always respond 200 to avoid user enumeration
     if not user:
-        return {"message": "If the email exists, a reset link has been sent."}
+        return
 
     token = create_password_reset_token(user)
     frontend_base = os.getenv("FRONTEND_BASE_URL", "http://localhost:3000")
     reset_link = f"{frontend_base}/reset-password?token={token}"
 
-    if not (EMAIL_USER and EMAIL_PASS):
-        print(f"[Email] Credentials not set. Reset link for {user.email}: {reset_link}")
-        return {"message": "If the email exists, a reset link has been sent."}
-
-    subject = "Reset your WithUs password"
-    body = f"""
-Hello {user.name},
-
-We received a request to reset your password for your WithUs account.
-Click the link below to choose a new password. This link expires soon.
-
-{reset_link}
-
-If you did not request a password reset, you can ignore this email.
-"""
-    msg = MIMEMultipart()
-    msg['From'] = EMAIL_USER
-    msg['To'] = user.email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-
-    try:
-        server = smtplib.SMTP(EMAIL_HOST, int(EMAIL_PORT))
-        server.starttls()
-        server.login(EMAIL_USER, EMAIL_PASS)
-        server.sendmail(EMAIL_USER, user.email, msg.as_string())
-        server.quit()
-    except Exception as e:
-        print(f"[Email] Failed to send reset email: {e}. Link: {reset_link}")
+    queue_password_reset_email(db, user, reset_link)
+    db.commit()
 
+@router.post("/password/forgot")
+async def forgot_password(payload: PasswordResetRequest, db: Session = Depends(get_db)):
+    """Generate a password reset link and email it to the user (if exists)."""
+    await run_db(db, _queue_reset_email, payload.email)
+    outbox_worker.wake()
     return {"message": "If the email exists, a reset link has been sent."}
 
-@router.post("/password/reset")
-def reset_password(payload: PasswordResetConfirm, db: Session = Depends(get_db)):
-    """Reset the password using a valid token."""
-    user = verify_password_reset_token(payload.token, db)
+def _save_new_password(db: Session, token: str, new_hash: str) -> None:
+    user = verify_password_reset_token(token, db)
     # If token invalid, an HTTPException is raised
-    new_hash = get_password_hash(payload.new_password)
     user.password_hash = new_hash
     db.add(user)
     db.commit()
-    return {"message": "Password has been reset successfully."}
\ No newline at end of file
+
+@router.post("/password/reset")
+async def reset_password(payload: PasswordResetConfirm, db: Session = Depends(get_db)):
+    """Reset the password using a valid token."""
+    # Reject bad tokens before spending a bcrypt round on them
+    await run_db(db, verify_password_reset_token, payload.token)
+    new_hash = await hash_password_async(payload.new_password)
+    await run_db(db, _save_new_password, payload.token, new_hash)
+    return {"message": "Password has been reset successfully."}
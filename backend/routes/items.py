@@ -1,50 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from typing import List
-from sqlalchemy import func
+from typing import List, Optional
+from sqlalchemy import tuple_
 
-from database import get_db
+from database import get_db, run_db
 from models import Item, Review
+from pagination import encode_cursor, decode_cursor, parse_datetime
+from search import search_items
 from schemas import Item as ItemSchema, ItemWithReviews
 from auth import get_current_user
+from cache import ALL_ITEMS_NAMESPACE, CATALOGUE_NAMESPACE, item_namespace
+from conditional import conditional_json, make_etag
 
 router = APIRouter()
 
-@router.get("/", response_model=List[ItemSchema])
-def get_items(
-    skip: int = 0,
-    limit: int = 100,
-    category: str = None,
-    db: Session = Depends(get_db)
+_item_list = TypeAdapter(List[ItemSchema])
+_category_list = TypeAdapter(List[str])
+
+# Keyset sort orders, each backed by an (optional category, column, id) index
+ITEM_SORTS = {
+    "created_at": (Item.created_at, parse_datetime),
+    "price": (Item.price, float),
+}
+
+def _item_page_query(
+    db: Session,
+    skip: int,
+    limit: int,
+    category: Optional[str],
+    sort: str,
+    cursor: Optional[str],
+    *entities
 ):
-    """Get all items with optional filtering."""
-    query = db.query(Item)
-    
+    column, parse = ITEM_SORTS[sort]
+    query = db.query(*entities)
+
     if category:
         query = query.filter(Item.category == category)
-    
-    items = query.offset(skip).limit(limit).all()
-    return items
 
-@router.get("/{item_id}", response_model=ItemWithReviews)
-def get_item(item_id: int, db: Session = Depends(get_db)):
-    """Get a specific item with its reviews."""
+    query = query.order_by(column, Item.id)
+    if cursor:
+        # Seek past the last row of the previous page instead of counting rows
+        value, last_id = decode_cursor(cursor, sort, parse)
+        query = query.filter(tuple_(column, Item.id) > (value, last_id))
+    else:
+        query = query.offset(skip)
+
+    return query.limit(limit)
+
+def _items_etag(rows) -> str:
+    # Versions only grow, so the page's (id, version) pairs change with any row in it
+    return make_etag("items", [(row.id, row.version) for row in rows])
+
+def _list_items(
+    db: Session,
+    skip: int,
+    limit: int,
+    category: Optional[str],
+    sort: str,
+    cursor: Optional[str]
+):
+    column, _ = ITEM_SORTS[sort]
+    items = _item_page_query(db, skip, limit, category, sort, cursor, Item).all()
+
+    next_cursor = None
+    if items and len(items) == limit:
+        last = items[-1]
+        next_cursor = encode_cursor(sort, getattr(last, column.key), last.id)
+    return items, next_cursor
+
+def _list_items_etag(db: Session, *page) -> str:
+    return _items_etag(_item_page_query(db, *page, Item.id, Item.version).all())
+
+def _item_etag(item_id: int, version: int) -> str:
+    return make_etag("item", item_id, version)
+
+def _item_version_etag(db: Session, item_id: int) -> Optional[str]:
+    # Reviews bump the item's version through its rating aggregates
+    version = db.query(Item.version).filter(Item.id == item_id).scalar()
+    return None if version is None else _item_etag(item_id, version)
+
+def _item_with_reviews(db: Session, item_id: int):
     item = db.query(Item).filter(Item.id == item_id).first()
     if not item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Item not found"
         )
-    
+
     # Get reviews for this item
     reviews = db.query(Review).filter(Review.item_id == item_id).all()
-    
-    # Calculate average rating
-    avg_rating = db.query(func.avg(Review.rating)).filter(Review.item_id == item_id).scalar()
-    
-    # Create response with reviews
-    item_data = ItemWithReviews(
+
+    # Create response with reviews; rating stats come from the item's aggregates
+    detail = ItemWithReviews(
         id=item.id,
+        sku=item.sku,
         name=item.name,
         description=item.description,
         image_url=item.image_url,
@@ -53,14 +104,81 @@ def get_item(item_id: int, db: Session = Depends(get_db)):
         stock_quantity=item.stock_quantity,
         created_at=item.created_at,
         reviews=reviews,
-        average_rating=float(avg_rating) if avg_rating else None,
-        review_count=len(reviews)
+        average_rating=item.average_rating,
+        review_count=item.review_count,
+        rating_histogram=item.rating_histogram
     )
-    
-    return item_data
+    return detail, _item_etag(item.id, item.version)
 
-@router.get("/categories/list")
-def get_categories(db: Session = Depends(get_db)):
-    """Get all available item categories."""
+def _list_categories(db: Session) -> List[str]:
     categories = db.query(Item.category).distinct().all()
-    return [category[0] for category in categories] 
\ No newline at end of file
+    return [category[0] for category in categories]
+
+@router.get("/", response_model=List[ItemSchema])
+async def get_items(
+    request: Request,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=500),
+    category: str = None,
+    sort: str = Query("created_at", pattern="^(created_at|price)$"),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Get all items with optional filtering.
+
+    Pass the ``X-Next-Cursor`` header from the previous page as ``cursor`` to
+    page by keyset instead of ``skip``.
+    """
+    page = (skip, limit, category, sort, cursor)
+
+    async def build():
+        items, next_cursor = await run_db(db, _list_items, *page)
+        body = _item_list.dump_json(_item_list.validate_python(items, from_attributes=True))
+        headers = {"ETag": _items_etag(items)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return body, headers
+
+    async def stamp():
+        return await run_db(db, _list_items_etag, *page)
+
+    key = f"list:{category}:{sort}:{limit}:{skip}:{cursor}"
+    return await conditional_json(
+        request, build, stamp, cache_key=((ALL_ITEMS_NAMESPACE, CATALOGUE_NAMESPACE), key)
+    )
+
+@router.get("/search", response_model=List[ItemSchema])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    category: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Ranked search over item names and descriptions, tolerant of typos."""
+    return await run_db(db, search_items, q, limit, category)
+
+@router.get("/{item_id}", response_model=ItemWithReviews)
+async def get_item(item_id: int, request: Request, db: Session = Depends(get_db)):
+    """Get a specific item with its reviews."""
+    async def build():
+        item, etag = await run_db(db, _item_with_reviews, item_id)
+        return item.model_dump_json().encode(), {"ETag": etag}
+
+    async def stamp():
+        return await run_db(db, _item_version_etag, item_id)
+
+    return await conditional_json(
+        request, build, stamp, cache_key=((ALL_ITEMS_NAMESPACE, item_namespace(item_id)), "detail")
+    )
+
+@router.get("/categories/list", response_model=List[str])
+async def get_categories(request: Request, db: Session = Depends(get_db)):
+    """Get all available item categories."""
+    async def build():
+        # No cheap stamp for DISTINCT, so the ETag hashes the (tiny) body
+        body = _category_list.dump_json(await run_db(db, _list_categories))
+        return body, {"ETag": make_etag("categories", body)}
+
+    return await conditional_json(
+        request, build, cache_key=((ALL_ITEMS_NAMESPACE, CATALOGUE_NAMESPACE), "categories")
+    )
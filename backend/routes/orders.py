@@ -1,81 +1,362 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, select, tuple_, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
-from database import get_db
-from models import Order, Item, User
-from schemas import OrderCreate, Order as OrderSchema, OrderWithDetails
-from auth import get_current_user
-from models import OrderStatus
-from email_utils import send_admin_order_notification, send_user_order_status_notification
+from database import get_db, run_db
+from models import Order, OrderLine, Item
+from pagination import encode_cursor, decode_cursor, parse_datetime
+from schemas import (
+    CurrentUser,
+    OrderCreate,
+    CheckoutCreate,
+    Order as OrderSchema,
+    OrderWithDetails,
+)
+from auth import get_current_user, get_current_user_stream
+from models import OrderStatus, ServiceType
+from email_utils import queue_admin_order_notification, queue_user_order_status_notification
+from outbox import outbox_worker
+from cache import mark_items_changed
+from sales import record_order_sales, record_order_status_change
+from idempotency import claim_key, request_fingerprint, store_response
+from events import ORDER_CREATED, ORDER_STATUS_CHANGED, order_events
 
 router = APIRouter()
 
-@router.post("/", response_model=OrderSchema)
-def create_order(
-    order: OrderCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Create a new order."""
-    # Check if item exists
-    item = db.query(Item).filter(Item.id == order.item_id).first()
-    if not item:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Item not found"
+# Upper bound on distinct items in one checkout
+MAX_ORDER_LINES = 100
+
+def _reserve_stock(db: Session, quantities: Dict[int, int]) -> Dict[int, float]:
+    """Atomically take stock for every item; returns {item_id: price} reserved.
+
+    One UPDATE covers all items: the sub-select locks the rows in id order (so
+    two carts sharing items can't deadlock) and the WHERE clause only matches
+    rows with enough stock. Fewer rows back than requested means the caller
+    must roll back.
+    """
+    item_ids = sorted(quantities)
+    quantity = case(quantities, value=Item.id)
+    locked = (
+        select(Item.id)
+        .where(Item.id.in_(item_ids))
+        .order_by(Item.id)
+        .with_for_update()
+    )
+    rows = db.execute(
+        update(Item)
+        .where(Item.id.in_(locked), Item.stock_quantity >= quantity)
+        .values(stock_quantity=Item.stock_quantity - quantity)
+        .returning(Item.id, Item.price)
+        .execution_options(synchronize_session=False)
+    ).all()
+    mark_items_changed(db, quantities)
+    return {item_id: price for item_id, price in rows}
+
+def _release_stock(db: Session, quantities: Dict[int, int]) -> None:
+    quantity = case(quantities, value=Item.id)
+    db.execute(
+        update(Item)
+        .where(Item.id.in_(sorted(quantities)))
+        .values(stock_quantity=Item.stock_quantity + quantity)
+        .execution_options(synchronize_session=False)
+    )
+    mark_items_changed(db, quantities)
+
+def _stock_error(db: Session, quantities: Dict[int, int]) -> HTTPException:
+    """Explain why a reservation came back short."""
+    db.rollback()
+    found = {item_id for (item_id,) in db.query(Item.id).filter(Item.id.in_(list(quantities)))}
+    missing = sorted(set(quantities) - found)
+    if missing:
+        detail = "Item not found" if len(quantities) == 1 else f"Items not found: {missing}"
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+    if len(quantities) == 1:
+        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient stock")
+    short = sorted(
+        item_id for (item_id,) in db.query(Item.id).filter(
+            Item.id.in_(list(quantities)),
+            Item.stock_quantity < case(quantities, value=Item.id)
         )
-    
-    # Check stock availability
-    if item.stock_quantity < order.quantity:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient stock"
+    )
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Insufficient stock for items: {short}"
+    )
+
+def _place_order(
+    db: Session,
+    user_id: int,
+    details: dict,
+    lines: List[tuple],
+    single_item: bool,
+    idempotency=None
+) -> OrderSchema:
+    """Reserve stock for all lines and write the order in one transaction.
+
+    ``idempotency`` is a claimed IdempotencyKey; the response is stored on it
+    in the same transaction.
+    """
+    if not lines:
+        raise HTTPException(status_code=400, detail="Order has no lines")
+    if len(lines) > MAX_ORDER_LINES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ORDER_LINES} lines per order")
+
+    quantities = {}
+    for item_id, quantity in lines:
+        if quantity < 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Quantity must be at least 1"
+            )
+        quantities[item_id] = quantities.get(item_id, 0) + quantity
+
+    # Reserve stock
+    prices = _reserve_stock(db, quantities)
+    if len(prices) != len(quantities):
+        raise _stock_error(db, quantities)
+
+    order_lines = [
+        OrderLine(
+            item_id=item_id,
+            quantity=quantity,
+            unit_price=prices[item_id],
+            line_total=prices[item_id] * quantity
         )
-    
-    # Calculate total price
-    total_price = item.price * order.quantity
-    
+        for item_id, quantity in sorted(quantities.items())
+    ]
+
     # Create order
     db_order = Order(
-        user_id=current_user.id,
-        item_id=order.item_id,
-        service_type=order.service_type,
-        quantity=order.quantity,
-        total_price=total_price,
-        delivery_address=order.delivery_address,
-        scheduled_time=order.scheduled_time,
-        mobile_number=order.mobile_number
+        user_id=user_id,
+        item_id=order_lines[0].item_id if single_item else None,
+        quantity=sum(quantities.values()),
+        total_price=sum(line.line_total for line in order_lines),
+        lines=order_lines,
+        **details
     )
-    
-    # Update stock
-    item.stock_quantity -= order.quantity
-    
+
     db.add(db_order)
+    db.flush()
+
+    # One admin notification per order, sent with the order's transaction
+    queue_admin_order_notification(db, db_order)
+    record_order_sales(db, db_order)
+    if idempotency is not None:
+        store_response(idempotency, OrderSchema.model_validate(db_order).model_dump_json(), order_id=db_order.id)
+
     db.commit()
     db.refresh(db_order)
-    
-    # Send admin notification
-    send_admin_order_notification(db_order)
-    
+
+    return OrderSchema.model_validate(db_order)
+
+def _place_order_once(
+    db: Session,
+    user_id: int,
+    idempotency_key: Optional[str],
+    fingerprint: str,
+    place,
+    *args
+) -> Tuple[OrderSchema, bool]:
+    """Run ``place`` unless ``idempotency_key`` already produced an order; returns (order, replayed)."""
+    if idempotency_key is None:
+        return place(db, user_id, *args), False
+    record, stored = claim_key(db, user_id, idempotency_key, fingerprint)
+    if record is None:
+        # Replays never reach stock, rollups or the email outbox
+        return OrderSchema.model_validate_json(stored), True
+    return place(db, user_id, *args, idempotency=record), False
+
+def _create_order(db: Session, user_id: int, order: OrderCreate, idempotency=None) -> OrderSchema:
+    details = order.model_dump(exclude={"item_id", "quantity"})
+    return _place_order(db, user_id, details, [(order.item_id, order.quantity)], True, idempotency)
+
+def _checkout(db: Session, user_id: int, checkout: CheckoutCreate, idempotency=None) -> OrderSchema:
+    details = checkout.model_dump(exclude={"lines"})
+    lines = [(line.item_id, line.quantity) for line in checkout.lines]
+    return _place_order(db, user_id, details, lines, False, idempotency)
+
+def _order_details(orders: List[Order]) -> List[OrderWithDetails]:
+    return [OrderWithDetails.model_validate(order) for order in orders]
+
+def _orders_with_details(db: Session):
+    # Item and user are many-to-one, so they are joined into the main SELECT;
+    # lines come from one extra IN query for the whole page.
+    return db.query(Order).options(
+        joinedload(Order.item),
+        joinedload(Order.user),
+        selectinload(Order.lines)
+    )
+
+def _all_orders(
+    db: Session,
+    limit: Optional[int],
+    cursor: Optional[str],
+    order_status: Optional[OrderStatus],
+    service_type: Optional[ServiceType],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime]
+):
+    query = _orders_with_details(db)
+
+    if order_status is not None:
+        query = query.filter(Order.status == order_status)
+    if service_type is not None:
+        query = query.filter(Order.service_type == service_type)
+    if created_from is not None:
+        query = query.filter(Order.created_at >= created_from)
+    if created_to is not None:
+        query = query.filter(Order.created_at < created_to)
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, "created_at", parse_datetime)
+        query = query.filter(tuple_(Order.created_at, Order.id) > (created_at, last_id))
+
+    query = query.order_by(Order.created_at, Order.id)
+    if limit is not None:
+        query = query.limit(limit)
+    orders = query.all()
+
+    next_cursor = None
+    if limit is not None and len(orders) == limit:
+        next_cursor = encode_cursor("created_at", orders[-1].created_at, orders[-1].id)
+    return _order_details(orders), next_cursor
+
+def _user_orders(db: Session, user_id: int) -> List[OrderWithDetails]:
+    return _order_details(_orders_with_details(db).filter(Order.user_id == user_id).all())
+
+def _get_order(db: Session, order_id: int, current_user: CurrentUser) -> OrderWithDetails:
+    order = _orders_with_details(db).filter(Order.id == order_id).first()
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
+
+    # Check if user is authorized to view this order
+    if order.user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view this order"
+        )
+
+    return OrderWithDetails.model_validate(order)
+
+def _update_order_status(
+    db: Session,
+    order_id: int,
+    new_status: OrderStatus,
+    cancellation_reason: Optional[str]
+) -> OrderSchema:
+    # Lock the order so two status changes can't both restore its stock
+    order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if new_status == OrderStatus.CANCELLED and not cancellation_reason:
+        raise HTTPException(status_code=400, detail="Cancellation reason required")
+    old_status = order.status
+    was_cancelled = old_status == OrderStatus.CANCELLED
+    if new_status == OrderStatus.CANCELLED and not was_cancelled:
+        _release_stock(db, order.line_quantities)
+    elif was_cancelled and new_status != OrderStatus.CANCELLED:
+        # Reinstating a cancelled order has to win its stock back
+        quantities = order.line_quantities
+        if len(_reserve_stock(db, quantities)) != len(quantities):
+            raise _stock_error(db, quantities)
+    order.status = new_status
+    if new_status == OrderStatus.CANCELLED:
+        order.cancellation_reason = cancellation_reason
+    else:
+        order.cancellation_reason = None
+    queue_user_order_status_notification(db, order)
+    record_order_status_change(db, order, old_status)
+    db.commit()
+    db.refresh(order)
+    return OrderSchema.model_validate(order)
+
+def _publish(event: str, order: OrderSchema) -> None:
+    order_events.publish(event, order.user_id, order.model_dump_json())
+
+@router.post("/", response_model=OrderSchema)
+async def create_order(
+    order: OrderCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create a new order.
+
+    Send an ``Idempotency-Key`` header to make retries safe: a repeat of the
+    same request returns the first response (marked ``Idempotent-Replayed``)
+    instead of placing another order.
+    """
+    fingerprint = request_fingerprint("POST /api/orders/", order.model_dump_json())
+    db_order, replayed = await run_db(
+        db, _place_order_once, current_user.id, idempotency_key, fingerprint, _create_order, order
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    else:
+        outbox_worker.wake()
+        _publish(ORDER_CREATED, db_order)
+    return db_order
+
+@router.post("/checkout", response_model=OrderSchema)
+async def checkout(
+    checkout: CheckoutCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Place one order for several items, reserving all stock in a single transaction.
+
+    Accepts an ``Idempotency-Key`` header like ``POST /api/orders/``.
+    """
+    fingerprint = request_fingerprint("POST /api/orders/checkout", checkout.model_dump_json())
+    db_order, replayed = await run_db(
+        db, _place_order_once, current_user.id, idempotency_key, fingerprint, _checkout, checkout
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    else:
+        outbox_worker.wake()
+        _publish(ORDER_CREATED, db_order)
     return db_order
 
 @router.get("/all", response_model=List[OrderWithDetails])
-def get_all_orders(
-    current_user: User = Depends(get_current_user),
+async def get_all_orders(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[OrderStatus] = None,
+    service_type: Optional[ServiceType] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Admin: Get all orders."""
+    """Admin: Get all orders.
+
+    Filter by status, service type and a created_at range; with ``limit`` the
+    ``X-Next-Cursor`` header pages through the rest.
+    """
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    orders = db.query(Order).all()
+    orders, next_cursor = await run_db(
+        db, _all_orders, limit, cursor, status, service_type, created_from, created_to
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return orders
 
 # Make sure this comes AFTER /all
 @router.get("/user/{user_id}", response_model=List[OrderWithDetails])
-def get_user_orders(
+async def get_user_orders(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all orders for a specific user."""
@@ -85,55 +366,55 @@ def get_user_orders(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view these orders"
         )
-    
-    orders = db.query(Order).filter(Order.user_id == user_id).all()
-    return orders
+
+    return await run_db(db, _user_orders, user_id)
+
+# Also before /{order_id}
+@router.get("/events")
+async def order_events_stream(current_user: CurrentUser = Depends(get_current_user_stream)):
+    """Server-sent events for order changes.
+
+    Customers receive ``order_created`` and ``order_status_changed`` for
+    their own orders, admins for every order; the data is the order as
+    returned by the other endpoints. Browsers' EventSource can't set
+    headers, so the token may be passed as ``?token=``. A ``resync`` event
+    means the client fell behind and events were dropped: refetch, then
+    reconnect.
+    """
+    if order_events.full:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many open event streams, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    return StreamingResponse(
+        order_events.stream(current_user),
+        media_type="text/event-stream",
+        # Proxies such as nginx would otherwise buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/{order_id}", response_model=OrderWithDetails)
-def get_order(
+async def get_order(
     order_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get a specific order."""
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Order not found"
-        )
-    
-    # Check if user is authorized to view this order
-    if order.user_id != current_user.id and current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to view this order"
-        )
-    
-    return order 
+    return await run_db(db, _get_order, order_id, current_user)
 
 @router.patch("/{order_id}/status", response_model=OrderSchema)
-def update_order_status(
+async def update_order_status(
     order_id: int,
     status: OrderStatus,
     cancellation_reason: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Admin: Accept or cancel an order."""
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    if status == OrderStatus.CANCELLED and not cancellation_reason:
-        raise HTTPException(status_code=400, detail="Cancellation reason required")
-    order.status = status
-    if status == OrderStatus.CANCELLED:
-        order.cancellation_reason = cancellation_reason
-    else:
-        order.cancellation_reason = None
-    db.commit()
-    db.refresh(order)
-    send_user_order_status_notification(order)
-    return order 
\ No newline at end of file
+    order = await run_db(db, _update_order_status, order_id, status, cancellation_reason)
+    outbox_worker.wake()
+    _publish(ORDER_STATUS_CHANGED, order)
+    return order
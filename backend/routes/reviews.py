@@ -1,21 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import func, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from database import get_db
+from database import get_db, run_db, open_session
 from models import Review, User, Item
-from schemas import ReviewCreate, Review as ReviewSchema, ReviewWithUser
+from pagination import encode_cursor, decode_cursor, parse_datetime
+from schemas import CurrentUser, ReviewCreate, Review as ReviewSchema, ReviewWithUser
 from auth import get_current_user
+from ratings import record_review_rating
+from conditional import PRIVATE_CACHE, PUBLIC_CACHE, conditional_json, etag_matches, make_etag, not_modified
+
+# Rows fetched per round-trip when streaming the full review list
+REVIEW_STREAM_BATCH = 500
+# Page size of /all when no limit is given; the full list needs ?all=true
+DEFAULT_REVIEW_PAGE = 50
 
 router = APIRouter()
 
-@router.post("/", response_model=ReviewSchema)
-def create_review(
-    review: ReviewCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Create a new review for an item."""
+_review_list = TypeAdapter(List[ReviewSchema])
+_review_with_user_list = TypeAdapter(List[ReviewWithUser])
+
+def _create_review(db: Session, review: ReviewCreate, user_id: int) -> Review:
     # Check if item exists
     item = db.query(Item).filter(Item.id == review.item_id).first()
     if not item:
@@ -23,43 +32,86 @@ def create_review(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Item not found"
         )
-    
+
     # Check if user has already reviewed this item
     existing_review = db.query(Review).filter(
-        Review.user_id == current_user.id,
+        Review.user_id == user_id,
         Review.item_id == review.item_id
     ).first()
-    
+
     if existing_review:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You have already reviewed this item"
         )
-    
+
     # Validate rating
     if review.rating < 1 or review.rating > 5:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Rating must be between 1 and 5"
         )
-    
+
     # Create review
     db_review = Review(
-        user_id=current_user.id,
+        user_id=user_id,
         item_id=review.item_id,
         rating=review.rating,
         comment=review.comment
     )
-    
+
     db.add(db_review)
-    db.commit()
+    try:
+        record_review_rating(db, review.item_id, review.rating)
+        db.commit()
+    except IntegrityError:
+        # A concurrent request won the race past the check above
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have already reviewed this item"
+        )
     db.refresh(db_review)
-    
+
     return db_review
 
-@router.get("/item/{item_id}", response_model=List[ReviewSchema])
-def get_item_reviews(item_id: int, db: Session = Depends(get_db)):
-    """Get all reviews for a specific item."""
+def _filter_reviews(
+    query,
+    item_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    rating: Optional[int] = None,
+    min_rating: Optional[int] = None
+):
+    if item_id is not None:
+        query = query.filter(Review.item_id == item_id)
+    if user_id is not None:
+        query = query.filter(Review.user_id == user_id)
+    if rating is not None:
+        query = query.filter(Review.rating == rating)
+    if min_rating is not None:
+        query = query.filter(Review.rating >= min_rating)
+    return query
+
+def _review_stamp(db: Session, **filters) -> Optional[str]:
+    """ETag for every review matching ``filters``.
+
+    Reviews are never edited or deleted through the API, so the set only
+    changes when a review with a higher id joins it. MAX(id) is answered
+    from an index rather than by counting the matching rows.
+    """
+    max_id = _filter_reviews(db.query(func.max(Review.id)), **filters).scalar()
+    # Nothing to revalidate against; an empty list is cheap to send anyway
+    return _reviews_etag(filters, max_id) if max_id is not None else None
+
+def _reviews_etag(filters: dict, max_id: Optional[int]) -> str:
+    return make_etag("reviews", sorted(filters.items()), max_id)
+
+def _rendered_reviews(reviews: List[Review], **filters):
+    body = _review_list.dump_json(_review_list.validate_python(reviews, from_attributes=True))
+    etag = _reviews_etag(filters, max((r.id for r in reviews), default=None))
+    return body, {"ETag": etag}
+
+def _item_reviews(db: Session, item_id: int):
     # Check if item exists
     item = db.query(Item).filter(Item.id == item_id).first()
     if not item:
@@ -67,14 +119,104 @@ def get_item_reviews(item_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Item not found"
         )
-    
-    reviews = db.query(Review).filter(Review.item_id == item_id).all()
-    return reviews
+
+    return _rendered_reviews(
+        db.query(Review).filter(Review.item_id == item_id).all(), item_id=item_id
+    )
+
+def _user_reviews(db: Session, user_id: int):
+    return _rendered_reviews(
+        db.query(Review).filter(Review.user_id == user_id).all(), user_id=user_id
+    )
+
+def _page_query(query, limit: int, cursor: Optional[str], **filters):
+    query = _filter_reviews(query, **filters)
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, "created_at", parse_datetime)
+        query = query.filter(tuple_(Review.created_at, Review.id) > (created_at, last_id))
+    return query.order_by(Review.created_at, Review.id).limit(limit)
+
+def _page_etag(ids: List[int]) -> str:
+    return make_etag("review-page", ids)
+
+def _review_page_etag(db: Session, limit: int, cursor: Optional[str], **filters) -> str:
+    return _page_etag([i for (i,) in _page_query(db.query(Review.id), limit, cursor, **filters)])
+
+def _review_page(
+    db: Session,
+    limit: int,
+    cursor: Optional[str],
+    item_id: Optional[int],
+    rating: Optional[int],
+    min_rating: Optional[int]
+):
+    """One keyset page of reviews joined to their author's name."""
+    query = db.query(Review, User.name).outerjoin(User, User.id == Review.user_id)
+    rows = _page_query(
+        query, limit, cursor, item_id=item_id, rating=rating, min_rating=min_rating
+    ).all()
+    result = [
+        ReviewWithUser(
+            id=review.id,
+            user_id=review.user_id,
+            item_id=review.item_id,
+            rating=review.rating,
+            comment=review.comment,
+            created_at=review.created_at,
+            user_name=user_name or "Unknown"
+        )
+        for review, user_name in rows
+    ]
+
+    next_cursor = None
+    if rows and len(rows) == limit:
+        last = rows[-1][0]
+        next_cursor = encode_cursor("created_at", last.created_at, last.id)
+    return result, next_cursor
+
+async def _stream_reviews(filters: dict):
+    # The request's session is closed once the response starts, so the
+    # stream opens its own and walks the table one keyset batch at a time.
+    async with open_session() as db:
+        yield "["
+        cursor = None
+        first = True
+        while True:
+            reviews, cursor = await run_db(
+                db, _review_page, REVIEW_STREAM_BATCH, cursor, **filters
+            )
+            for review in reviews:
+                yield ("" if first else ",") + review.model_dump_json()
+                first = False
+            if not cursor:
+                break
+        yield "]"
+
+@router.post("/", response_model=ReviewSchema)
+async def create_review(
+    review: ReviewCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create a new review for an item."""
+    return await run_db(db, _create_review, review, current_user.id)
+
+@router.get("/item/{item_id}", response_model=List[ReviewSchema])
+async def get_item_reviews(item_id: int, request: Request, db: Session = Depends(get_db)):
+    """Get all reviews for a specific item."""
+    async def build():
+        return await run_db(db, _item_reviews, item_id)
+
+    async def stamp():
+        return await run_db(db, _review_stamp, item_id=item_id)
+
+    return await conditional_json(request, build, stamp)
 
 @router.get("/user/{user_id}", response_model=List[ReviewSchema])
-def get_user_reviews(
+async def get_user_reviews(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all reviews by a specific user."""
@@ -84,24 +226,56 @@ def get_user_reviews(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view these reviews"
         )
-    
-    reviews = db.query(Review).filter(Review.user_id == user_id).all()
-    return reviews 
+
+    async def build():
+        return await run_db(db, _user_reviews, user_id)
+
+    async def stamp():
+        return await run_db(db, _review_stamp, user_id=user_id)
+
+    return await conditional_json(request, build, stamp, cache_control=PRIVATE_CACHE)
 
 @router.get("/all", response_model=List[ReviewWithUser])
-def get_all_reviews(db: Session = Depends(get_db)):
-    """Get all reviews with user info."""
-    reviews = db.query(Review).all()
-    result = []
-    for review in reviews:
-        user = db.query(User).filter(User.id == review.user_id).first()
-        result.append({
-            'id': review.id,
-            'user_id': review.user_id,
-            'item_id': review.item_id,
-            'rating': review.rating,
-            'comment': review.comment,
-            'created_at': review.created_at,
-            'user_name': user.name if user else "Unknown"
-        })
-    return result 
\ No newline at end of file
+async def get_all_reviews(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    item_id: Optional[int] = None,
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    min_rating: Optional[int] = Query(None, ge=1, le=5),
+    stream_all: bool = Query(False, alias="all"),
+    db: Session = Depends(get_db)
+):
+    """Get reviews with user info, one page at a time.
+
+    Returns ``limit`` reviews (50 by default) and an ``X-Next-Cursor``
+    header to pass back as ``cursor``. ``all=true`` without a ``limit``
+    streams the full list instead.
+    """
+    filters = {"item_id": item_id, "rating": rating, "min_rating": min_rating}
+    if limit is None and stream_all:
+        # The stamp is needed up front: headers go out before the first row
+        etag = await run_db(db, _review_stamp, **filters)
+        if etag and etag_matches(request, etag):
+            return not_modified(etag, PUBLIC_CACHE)
+        headers = {"Cache-Control": PUBLIC_CACHE}
+        if etag:
+            headers["ETag"] = etag
+        return StreamingResponse(
+            _stream_reviews(filters), media_type="application/json", headers=headers
+        )
+
+    limit = limit or DEFAULT_REVIEW_PAGE
+
+    async def build():
+        reviews, next_cursor = await run_db(db, _review_page, limit, cursor, **filters)
+        body = _review_with_user_list.dump_json(reviews)
+        headers = {"ETag": _page_etag([review.id for review in reviews])}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return body, headers
+
+    async def stamp():
+        return await run_db(db, _review_page_etag, limit, cursor, **filters)
+
+    return await conditional_json(request, build, stamp)
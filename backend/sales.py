@@ -0,0 +1,149 @@
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Date, cast, delete, exists, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import Item, Order, OrderLine, OrderStatus, SalesDaily, SalesDailyCategory
+
+# Rollup rows are keyed on the UTC day an order was placed, so the tables are
+# O(days x categories x statuses x service types) whatever the order volume.
+
+def _order_day(created_at: Optional[datetime]) -> date:
+    if created_at is None:
+        created_at = datetime.now(timezone.utc)
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+def _order_lines(order: Order):
+    """(item_id, units, revenue) per line; pre-cart orders only have item_id."""
+    if order.lines:
+        return [(line.item_id, line.quantity, line.line_total) for line in order.lines]
+    return [(order.item_id, order.quantity or 0, order.total_price)]
+
+def _add_rollup(db: Session, model, key: dict, orders: int, units: int, revenue: float) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = dialect_insert(model).values(**key, order_count=orders, units=units, revenue=revenue)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={
+                "order_count": model.order_count + stmt.excluded.order_count,
+                "units": model.units + stmt.excluded.units,
+                "revenue": model.revenue + stmt.excluded.revenue,
+            },
+        ))
+        return
+    matched = db.execute(
+        update(model)
+        .where(*(getattr(model, column) == value for column, value in key.items()))
+        .values(
+            order_count=model.order_count + orders,
+            units=model.units + units,
+            revenue=model.revenue + revenue,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not matched:
+        db.execute(insert(model).values(**key, order_count=orders, units=units, revenue=revenue))
+
+def _apply_order(db: Session, order: Order, statuses: Dict[OrderStatus, int]) -> None:
+    """Add the order to the rollups once per ``{status: sign}`` entry."""
+    day = _order_day(order.created_at)
+    lines = _order_lines(order)
+    categories = dict(
+        db.query(Item.id, Item.category).filter(Item.id.in_({item_id for item_id, _, _ in lines}))
+    )
+    per_category: Dict[str, Tuple[int, float]] = defaultdict(lambda: (0, 0.0))
+    for item_id, units, revenue in lines:
+        category = categories.get(item_id)
+        if category is not None:
+            total_units, total_revenue = per_category[category]
+            per_category[category] = (total_units + units, total_revenue + revenue)
+
+    # Rows are touched in key order so concurrent orders can't deadlock on them
+    for order_status, sign in sorted(statuses.items(), key=lambda entry: entry[0].name):
+        key = {"day": day, "status": order_status, "service_type": order.service_type}
+        _add_rollup(db, SalesDaily, key, sign, sign * (order.quantity or 0), sign * order.total_price)
+        for category, (units, revenue) in sorted(per_category.items()):
+            _add_rollup(db, SalesDailyCategory, {**key, "category": category}, sign, sign * units, sign * revenue)
+
+def record_order_sales(db: Session, order: Order) -> None:
+    """Fold a new order into the sales rollups.
+
+    Uses relative increments in the caller's transaction; call it just before
+    the commit so the shared per-day rows are locked as briefly as possible.
+    """
+    _apply_order(db, order, {order.status or OrderStatus.PENDING: 1})
+
+def record_order_status_change(db: Session, order: Order, old_status: Optional[OrderStatus]) -> None:
+    """Move an order's totals from ``old_status`` to its current status."""
+    old_status = old_status or OrderStatus.PENDING
+    if order.status == old_status:
+        return
+    _apply_order(db, order, {old_status: -1, order.status: 1})
+
+def _day_column(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.timezone("UTC", Order.created_at), Date)
+    # SQLite keeps timestamps as UTC text
+    return func.date(Order.created_at)
+
+def rebuild_sales_rollups(db: Session) -> int:
+    """Recompute both rollup tables from the orders. Returns orders counted."""
+    day = _day_column(db).label("day")
+    order_status = func.coalesce(Order.status, literal(OrderStatus.PENDING, Order.status.type)).label("status")
+
+    db.execute(delete(SalesDailyCategory))
+    db.execute(delete(SalesDaily))
+
+    db.execute(insert(SalesDaily).from_select(
+        ["day", "status", "service_type", "order_count", "units", "revenue"],
+        select(
+            day, order_status, Order.service_type,
+            func.count(Order.id), func.coalesce(func.sum(Order.quantity), 0), func.sum(Order.total_price)
+        ).group_by(day, order_status, Order.service_type)
+    ))
+
+    lines = select(
+        OrderLine.order_id, OrderLine.item_id,
+        OrderLine.quantity.label("units"), OrderLine.line_total.label("revenue")
+    ).union_all(
+        select(Order.id, Order.item_id, Order.quantity, Order.total_price).where(
+            Order.item_id.isnot(None),
+            ~exists().where(OrderLine.order_id == Order.id)
+        )
+    ).subquery()
+    db.execute(insert(SalesDailyCategory).from_select(
+        ["day", "category", "status", "service_type", "order_count", "units", "revenue"],
+        select(
+            day, Item.category, order_status, Order.service_type,
+            func.count(func.distinct(Order.id)),
+            func.coalesce(func.sum(lines.c.units), 0),
+            func.sum(lines.c.revenue)
+        )
+        .select_from(lines)
+        .join(Order, Order.id == lines.c.order_id)
+        .join(Item, Item.id == lines.c.item_id)
+        .group_by(day, Item.category, order_status, Order.service_type)
+    ))
+
+    counted = db.query(func.coalesce(func.sum(SalesDaily.order_count), 0)).scalar()
+    db.commit()
+    return counted
+
+if __name__ == "__main__":
+    import time
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        counted = rebuild_sales_rollups(db)
+        print(f"Rebuilt sales rollups from {counted} orders in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
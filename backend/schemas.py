@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Dict
+from datetime import date, datetime
 from models import ServiceType, OrderStatus
 
 # User Schemas
@@ -25,6 +25,7 @@ class User(UserBase):
 
 # Item Schemas
 class ItemBase(BaseModel):
+    sku: Optional[str] = None
     name: str
     description: Optional[str] = None
     image_url: Optional[str] = None
@@ -38,6 +39,8 @@ class ItemCreate(ItemBase):
 class Item(ItemBase):
     id: int
     created_at: datetime
+    average_rating: Optional[float] = None
+    review_count: int = 0
     
     class Config:
         from_attributes = True
@@ -82,13 +85,34 @@ class OrderBase(BaseModel):
 class OrderCreate(OrderBase):
     pass
 
+class OrderLineCreate(BaseModel):
+    item_id: int
+    quantity: int = 1
+
+class OrderLine(OrderLineCreate):
+    id: int
+    unit_price: float
+    line_total: float
+
+    class Config:
+        from_attributes = True
+
+class CheckoutCreate(BaseModel):
+    service_type: ServiceType
+    delivery_address: Optional[str] = None
+    scheduled_time: Optional[datetime] = None
+    mobile_number: Optional[str] = None
+    lines: List[OrderLineCreate]
+
 class Order(OrderBase):
     id: int
+    item_id: Optional[int] = None
     user_id: int
     status: OrderStatus
     total_price: float
     cancellation_reason: Optional[str] = None
     created_at: datetime
+    lines: List[OrderLine] = []
     
     class Config:
         from_attributes = True
@@ -100,6 +124,19 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
+    role: Optional[str] = None
+
+class CurrentUser(BaseModel):
+    """The authenticated caller, detached from any database session."""
+    id: int
+    email: str
+    role: str
+    name: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+        frozen = True
 
 # Password reset schemas
 class PasswordResetRequest(BaseModel):
@@ -112,9 +149,19 @@ class PasswordResetConfirm(BaseModel):
 # Response Schemas
 class ItemWithReviews(Item):
     reviews: List[Review] = []
-    average_rating: Optional[float] = None
-    review_count: int = 0
+    rating_histogram: Dict[int, int] = {}
 
 class OrderWithDetails(Order):
-    item: Item
-    user: User 
\ No newline at end of file
+    item: Optional[Item] = None
+    user: User
+
+# Analytics Schemas
+class SalesRow(BaseModel):
+    """One group of the sales report; dimensions not grouped on are None."""
+    day: Optional[date] = None
+    category: Optional[str] = None
+    status: Optional[OrderStatus] = None
+    service_type: Optional[ServiceType] = None
+    orders: int
+    units: int
+    revenue: float
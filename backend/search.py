@@ -0,0 +1,319 @@
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from rapidfuzz import process
+from rapidfuzz.distance import OSA
+from sqlalchemy import event, func, literal_column, select
+from sqlalchemy.orm import Session, object_session
+
+from database import SessionLocal
+from models import Item
+
+# "auto" uses Postgres full-text search when available, else the in-process index
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto").lower()
+# Full rebuild interval, picks up items changed by other worker processes
+SEARCH_INDEX_REFRESH_SECONDS = float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "300"))
+# Typos tolerated per query term: one edit (a transposition counts as one)
+# from SEARCH_FUZZY_MIN_LENGTH letters, two from SEARCH_FUZZY_TWO_EDITS_LENGTH
+SEARCH_FUZZY_MIN_LENGTH = int(os.getenv("SEARCH_FUZZY_MIN_LENGTH", "3"))
+SEARCH_FUZZY_TWO_EDITS_LENGTH = int(os.getenv("SEARCH_FUZZY_TWO_EDITS_LENGTH", "6"))
+
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def stem(token: str) -> str:
+    """Fold English plurals so "mangoes", "apples" and "berries" match their singulars."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("sses", "shes", "ches", "xes", "oes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def terms(text: Optional[str]) -> List[str]:
+    """Index and query terms: tokens with plurals folded, the same on both sides."""
+    return [stem(token) for token in tokenize(text)]
+
+
+def max_edits(length: int) -> int:
+    if length < SEARCH_FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if length < SEARCH_FUZZY_TWO_EDITS_LENGTH else 2
+
+
+class InvertedIndex:
+    """In-process inverted index over item names and descriptions."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._doc_terms: Dict[int, List[str]] = {}
+        self._vocab: List[str] = []
+        self._by_length: Dict[int, List[str]] = {}
+        self._vocab_dirty = False
+        # Changes committed while a rebuild reads its snapshot, replayed after the swap
+        self._replay: Optional[Dict[int, Optional[Tuple[str, Optional[str]]]]] = None
+        self.built_at: Optional[float] = None
+
+    @staticmethod
+    def _index(postings, doc_terms, item_id: int, name: Optional[str], description: Optional[str]) -> bool:
+        """Add one item to ``postings``; True when it brought new terms."""
+        weights: Dict[str, float] = {}
+        for term in terms(description):
+            weights[term] = max(weights.get(term, 0), DESCRIPTION_WEIGHT)
+        for term in terms(name):
+            weights[term] = NAME_WEIGHT
+        new_terms = False
+        for term, weight in weights.items():
+            if term not in postings:
+                new_terms = True
+            postings[term][item_id] = weight
+        doc_terms[item_id] = list(weights)
+        return new_terms
+
+    def _add(self, item_id: int, name: Optional[str], description: Optional[str]):
+        if self._index(self._postings, self._doc_terms, item_id, name, description):
+            self._vocab_dirty = True
+
+    def _remove(self, item_id: int):
+        for token in self._doc_terms.pop(item_id, []):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(item_id, None)
+            if not postings:
+                del self._postings[token]
+                self._vocab_dirty = True
+
+    def rebuild(self, rows):
+        """Index ``rows`` from scratch; searches keep using the old index until the swap.
+
+        ``rows`` should be read lazily: changes applied from the moment this
+        is called are queued and replayed over the new index, so a commit the
+        snapshot missed isn't lost.
+        """
+        with self._lock:
+            self._replay = {}
+        try:
+            postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+            doc_terms: Dict[int, List[str]] = {}
+            for item_id, name, description in rows:
+                self._index(postings, doc_terms, item_id, name, description)
+            with self._lock:
+                self._postings = postings
+                self._doc_terms = doc_terms
+                self._vocab_dirty = True
+                for item_id, fields in self._replay.items():
+                    self._remove(item_id)
+                    if fields is not None:
+                        self._add(item_id, *fields)
+                self.built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._replay = None
+
+    def apply(self, changes: Dict[int, Optional[Tuple[str, Optional[str]]]]):
+        """Apply committed changes: item id to (name, description), or None when deleted."""
+        with self._lock:
+            if self._replay is not None:
+                self._replay.update(changes)
+            if self.built_at is None:
+                # The first build reads them from the database
+                return
+            for item_id, fields in changes.items():
+                self._remove(item_id)
+                if fields is not None:
+                    self._add(item_id, *fields)
+
+    def upsert(self, item_id: int, name: Optional[str], description: Optional[str]):
+        self.apply({item_id: (name, description)})
+
+    def remove(self, item_id: int):
+        self.apply({item_id: None})
+
+    def _refresh_vocab(self):
+        self._vocab = sorted(self._postings)
+        by_length = defaultdict(list)
+        for term in self._vocab:
+            by_length[len(term)].append(term)
+        self._by_length = dict(by_length)
+        self._vocab_dirty = False
+
+    def _candidates(self, token: str) -> List[Tuple[str, float]]:
+        """Indexed terms matching a query token, with a 0-1 similarity."""
+        if self._vocab_dirty:
+            self._refresh_vocab()
+        matches = {}
+        if token in self._postings:
+            matches[token] = 1.0
+        # Prefix matches so partial words still find something while typing
+        start = bisect_left(self._vocab, token)
+        for term in self._vocab[start:start + 20]:
+            if not term.startswith(token):
+                break
+            matches.setdefault(term, 0.9)
+        # Typos, alongside exact hits: edit distance with adjacent transpositions
+        # counting once (OSA), only against terms whose length is within reach
+        edits = max_edits(len(token))
+        for length in range(len(token) - edits, len(token) + edits + 1):
+            bucket = self._by_length.get(length)
+            if not bucket:
+                continue
+            for term, distance, _ in process.extract(
+                token, bucket, scorer=OSA.distance, score_cutoff=edits, limit=5
+            ):
+                matches.setdefault(term, 0.8 * (1 - distance / max(len(token), len(term))))
+        return list(matches.items())
+
+    def search(self, query: str, limit: int) -> List[int]:
+        tokens = list(dict.fromkeys(terms(query)))
+        if not tokens:
+            return []
+        with self._lock:
+            total = max(len(self._doc_terms), 1)
+            scores: Dict[int, float] = defaultdict(float)
+            hits: Dict[int, int] = defaultdict(int)
+            for token in tokens:
+                best: Dict[int, float] = {}
+                for term, similarity in self._candidates(token):
+                    postings = self._postings[term]
+                    idf = 1.0 + (total / (1 + len(postings))) ** 0.5
+                    for item_id, weight in postings.items():
+                        score = weight * similarity * idf
+                        if score > best.get(item_id, 0):
+                            best[item_id] = score
+                for item_id, score in best.items():
+                    scores[item_id] += score
+                    hits[item_id] += 1
+        # Items matching every term first, then by score
+        ranked = sorted(scores, key=lambda i: (-hits[i], -scores[i], i))
+        return ranked[:limit]
+
+
+search_index = InvertedIndex()
+
+
+def _item_written(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("search_changes", {})[target.id] = (target.name, target.description)
+
+
+def _item_deleted(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("search_changes", {})[target.id] = None
+
+
+def _index_after_commit(session):
+    # Only committed rows reach the index; values were captured at flush,
+    # before the commit expired them
+    changes = session.info.pop("search_changes", None)
+    if changes:
+        search_index.apply(changes)
+
+
+def _discard_after_rollback(session):
+    session.info.pop("search_changes", None)
+
+
+# Keep the index current for ORM writes in this process
+event.listen(Item, "after_insert", _item_written)
+event.listen(Item, "after_update", _item_written)
+event.listen(Item, "after_delete", _item_deleted)
+event.listen(Session, "after_commit", _index_after_commit)
+event.listen(Session, "after_rollback", _discard_after_rollback)
+
+
+def rebuild_search_index(db: Session) -> None:
+    search_index.rebuild(db.query(Item.id, Item.name, Item.description).yield_per(5000))
+
+
+# Held by whoever is rebuilding, so concurrent requests never rebuild twice
+_rebuild_lock = threading.Lock()
+
+
+def _is_stale() -> bool:
+    return (
+        search_index.built_at is None
+        or time.monotonic() - search_index.built_at > SEARCH_INDEX_REFRESH_SECONDS
+    )
+
+
+def _refresh_in_background() -> None:
+    """Rebuild on a thread of its own (the caller holds _rebuild_lock)."""
+    def run():
+        db = SessionLocal()
+        try:
+            rebuild_search_index(db)
+        except Exception as e:
+            print(f"[Search] Index refresh failed: {e}")
+        finally:
+            db.close()
+            _rebuild_lock.release()
+
+    threading.Thread(target=run, name="search-index-refresh", daemon=True).start()
+
+
+def ensure_search_index(db: Session) -> None:
+    """Build the index on first use; later, refresh it without making anyone wait.
+
+    The first build happens inline, once: concurrent requests wait for it and
+    then find it done. A stale index keeps serving while one background
+    thread rebuilds it.
+    """
+    if search_index.built_at is None:
+        with _rebuild_lock:
+            if search_index.built_at is None:
+                rebuild_search_index(db)
+        return
+    if _is_stale() and _rebuild_lock.acquire(blocking=False):
+        if not _is_stale():
+            _rebuild_lock.release()
+            return
+        _refresh_in_background()
+
+
+def _use_postgres(db: Session) -> bool:
+    if SEARCH_BACKEND == "postgres":
+        return True
+    if SEARCH_BACKEND == "memory":
+        return False
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def search_items(db: Session, query: str, limit: int, category: Optional[str] = None) -> List[Item]:
+    """Ranked item search over name and description."""
+    if _use_postgres(db):
+        tsquery = func.websearch_to_tsquery("english", query)
+        vector = literal_column("items.search_vector")
+        stmt = select(Item).where(vector.op("@@")(tsquery))
+        if category:
+            stmt = stmt.where(Item.category == category)
+        stmt = stmt.order_by(func.ts_rank(vector, tsquery).desc(), Item.id).limit(limit)
+        return list(db.scalars(stmt))
+
+    ensure_search_index(db)
+    # Over-fetch when filtering so the category filter still fills the page
+    ids = search_index.search(query, limit * 5 if category else limit)
+    if not ids:
+        return []
+    items = {item.id: item for item in db.query(Item).filter(Item.id.in_(ids))}
+    ranked = [items[i] for i in ids if i in items]
+    if category:
+        ranked = [item for item in ranked if item.category == category]
+    return ranked[:limit]
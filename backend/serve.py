@@ -0,0 +1,150 @@
+"""
+Production launcher for the WithUs API.
+
+    python serve.py
+
+Runs uvicorn's process manager with one event loop per worker. Anything not
+set in the environment comes from a preset derived from the CPUs this
+container may actually use (affinity and cgroup quota, not the host's count):
+
+- SERVER_WORKERS (or WEB_CONCURRENCY): one worker per usable CPU. Handlers
+  don't block the loop, so more processes than cores only adds context
+  switches and database connections. Order event streams need
+  SSE_BACKEND=redis to see changes made in other workers; without it the
+  launcher warns when it starts more than one.
+- SERVER_BACKLOG: 2048 pending connections, clamped to net.core.somaxconn,
+  which the kernel would silently apply anyway.
+- SERVER_KEEP_ALIVE: 75 s, longer than the usual 60 s load balancer idle
+  timeout so the balancer, not us, closes idle connections.
+- SERVER_GRACEFUL_TIMEOUT: 30 s for in-flight requests to finish after
+  SIGTERM. Each worker then stops the outbox and disposes its engine.
+- SERVER_LOOP / SERVER_HTTP: uvloop and httptools when installed, else
+  asyncio and h11.
+
+With several workers, PROMETHEUS_MULTIPROC_DIR defaults to a fresh temporary
+directory so /metrics reports all of them, whichever one serves the scrape.
+
+Each worker has its own connection pool, so size DB_POOL_SIZE and
+DB_MAX_OVERFLOW for SERVER_WORKERS * (size + overflow) connections.
+"""
+import glob
+import importlib.util
+import os
+import tempfile
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def usable_cpus() -> int:
+    """CPUs available to this process, honouring affinity and a cgroup v2 quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def _somaxconn(default: int) -> int:
+    try:
+        with open("/proc/sys/net/core/somaxconn") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return default
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def cpu_preset(cpus: int) -> dict:
+    """Server settings tuned for ``cpus`` cores."""
+    return {
+        "workers": cpus,
+        "backlog": min(2048, _somaxconn(2048)),
+        "timeout_keep_alive": 75,
+        "timeout_graceful_shutdown": 30,
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+    }
+
+
+def order_events_per_worker() -> bool:
+    """Whether order event streams only see their own worker's changes (see events.py)."""
+    if int(os.getenv("SSE_MAX_CONNECTIONS", "10000")) <= 0:
+        return False
+    shared = "redis" if os.getenv("CACHE_BACKEND", "memory").lower() == "redis" else "memory"
+    return os.getenv("SSE_BACKEND", shared).lower() != "redis"
+
+
+def server_config() -> dict:
+    config = cpu_preset(usable_cpus())
+    workers = os.getenv("SERVER_WORKERS") or os.getenv("WEB_CONCURRENCY")
+    if workers:
+        config["workers"] = int(workers)
+    if os.getenv("SERVER_BACKLOG"):
+        config["backlog"] = int(os.getenv("SERVER_BACKLOG"))
+    if os.getenv("SERVER_KEEP_ALIVE"):
+        config["timeout_keep_alive"] = int(os.getenv("SERVER_KEEP_ALIVE"))
+    if os.getenv("SERVER_GRACEFUL_TIMEOUT"):
+        config["timeout_graceful_shutdown"] = int(os.getenv("SERVER_GRACEFUL_TIMEOUT"))
+    config["loop"] = os.getenv("SERVER_LOOP", config["loop"])
+    config["http"] = os.getenv("SERVER_HTTP", config["http"])
+    # Recycle workers after this many requests; 0 disables
+    max_requests = int(os.getenv("SERVER_MAX_REQUESTS", "0"))
+    config["limit_max_requests"] = max_requests or None
+    config.update(
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 8000)),
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        access_log=os.getenv("SERVER_ACCESS_LOG", "False").lower() == "true",
+        reload=False,
+    )
+    return config
+
+
+def prepare_metrics_dir(workers: int) -> None:
+    """Give the workers a shared directory free of earlier runs' metric files."""
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        if workers < 2:
+            return
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="withus-metrics-")
+        return
+    os.makedirs(path, exist_ok=True)
+    # Files left by a previous run would be summed into this one's metrics.
+    # Only the client's own *.db files go; anything else in there is left alone.
+    stale = glob.glob(os.path.join(path, "*.db"))
+    for name in stale:
+        os.remove(name)
+    if stale:
+        print(f"[Server] Removed {len(stale)} metric files from a previous run in {path}")
+
+
+if __name__ == "__main__":
+    config = server_config()
+    prepare_metrics_dir(config["workers"])
+    connections = config["workers"] * (
+        int(os.getenv("DB_POOL_SIZE", "5")) + int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    )
+    if config["workers"] > 1 and order_events_per_worker():
+        print(
+            f"[Server] SSE_BACKEND is not redis: with {config['workers']} workers, order event "
+            "streams only see changes made in their own worker"
+        )
+    print(
+        f"[Server] {config['workers']} workers, loop={config['loop']}, http={config['http']}, "
+        f"backlog={config['backlog']}, keep-alive={config['timeout_keep_alive']}s, "
+        f"up to {connections} database connections"
+    )
+    uvicorn.run("main:app", **config)
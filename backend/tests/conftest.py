@@ -0,0 +1,80 @@
+"""Shared fixtures: a throwaway SQLite file database seeded by init_db.
+
+Settings are read from the environment when modules are first imported, so
+they are fixed here before any application module loads.
+"""
+import os
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="withus-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ["DB_MODE"] = "sync"
+os.environ["EMAIL_USER"] = ""
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["RATE_LIMIT_BACKEND"] = "none"
+os.environ["LOAD_SHED_MAX_IN_FLIGHT"] = "0"
+# Keep the background workers from polling in the middle of a test
+os.environ["OUTBOX_POLL_INTERVAL"] = "3600"
+os.environ["IDEMPOTENCY_SWEEP_INTERVAL"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+
+import init_db
+from database import SessionLocal
+from models import Item
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    init_db.init_db()
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="module")
+def client():
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _login(client, email, password):
+    response = client.post("/api/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def admin_headers(client):
+    return _login(client, "admin@withus.com", "admin123")
+
+
+@pytest.fixture(scope="module")
+def customer_headers(client):
+    return _login(client, "john@example.com", "password123")
+
+
+@pytest.fixture
+def make_item():
+    """Create an item directly in the database; returns its id."""
+    def make(name="Test item", price=10.0, stock=100, category="Test", description="Test item"):
+        session = SessionLocal()
+        try:
+            item = Item(name=name, price=price, stock_quantity=stock, category=category, description=description)
+            session.add(item)
+            session.commit()
+            return item.id
+        finally:
+            session.close()
+
+    return make
@@ -0,0 +1,56 @@
+"""Authenticated-user cache: role and credential changes apply on the next request."""
+from auth import get_password_hash, user_cache
+from database import SessionLocal
+from models import User
+
+
+def _make_admin(email):
+    db = SessionLocal()
+    try:
+        user = User(email=email, name="Temp admin", password_hash=get_password_hash("secret123"), role="admin")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def _login(client, email):
+    response = client.post("/api/auth/login", json={"email": email, "password": "secret123"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_demoted_admin_loses_access_on_the_next_request(client):
+    user_id = _make_admin("demoted@example.com")
+    headers = _login(client, "demoted@example.com")
+    assert client.get("/api/orders/all", headers=headers).status_code == 200
+    assert user_cache.get(user_id) is not None
+
+    db = SessionLocal()
+    try:
+        db.get(User, user_id).role = "customer"
+        db.flush()
+        # Not committed yet: the cached user stays
+        assert user_cache.get(user_id) is not None
+        db.commit()
+    finally:
+        db.close()
+
+    assert user_cache.get(user_id) is None
+    assert client.get("/api/orders/all", headers=headers).status_code == 403
+
+
+def test_rolled_back_change_keeps_the_cached_user(client):
+    user_id = _make_admin("kept@example.com")
+    headers = _login(client, "kept@example.com")
+    assert client.get("/api/orders/all", headers=headers).status_code == 200
+
+    db = SessionLocal()
+    try:
+        db.get(User, user_id).role = "customer"
+        db.flush()
+        db.rollback()
+    finally:
+        db.close()
+    assert user_cache.get(user_id) is not None
@@ -0,0 +1,98 @@
+"""Order event fan-out: the Redis relay between workers and ending streams on shutdown."""
+import asyncio
+
+import fakeredis
+import pytest
+
+from events import OrderEventBroker, RedisEventRelay, order_events
+from schemas import CurrentUser
+
+CUSTOMER = CurrentUser(id=7, email="customer@example.com", role="customer")
+ADMIN = CurrentUser(id=1, email="admin@example.com", role="admin")
+
+
+async def _open(broker, user):
+    stream = broker.stream(user)
+    assert (await stream.__anext__()).startswith("retry:")
+    return stream
+
+
+def test_redis_relay_reaches_streams_on_other_workers():
+    server = fakeredis.FakeServer()
+    workers = [
+        OrderEventBroker(relay=RedisEventRelay(client=fakeredis.FakeRedis(server=server)))
+        for _ in range(2)
+    ]
+
+    async def scenario():
+        for broker in workers:
+            await broker.start()
+        try:
+            customer = await _open(workers[1], CUSTOMER)
+            admin = await _open(workers[0], ADMIN)
+            other = await _open(workers[1], CurrentUser(id=8, email="o@example.com", role="customer"))
+            pending = asyncio.ensure_future(other.__anext__())
+
+            workers[0].publish("order_created", CUSTOMER.id, '{"id": 1}')
+            received = await asyncio.wait_for(
+                asyncio.gather(customer.__anext__(), admin.__anext__()), 5
+            )
+            await asyncio.sleep(0.2)
+            assert not pending.done()
+            pending.cancel()
+            return received
+        finally:
+            for broker in workers:
+                broker.close()
+
+    received = asyncio.run(scenario())
+    for message in received:
+        assert "event: order_created\n" in message
+        assert 'data: {"id": 1}\n' in message
+
+
+def test_without_relay_publish_delivers_locally():
+    broker = OrderEventBroker()
+
+    async def scenario():
+        stream = await _open(broker, CUSTOMER)
+        broker.publish("order_status_changed", CUSTOMER.id, "{}")
+        return await asyncio.wait_for(stream.__anext__(), 1)
+
+    assert "event: order_status_changed\n" in asyncio.run(scenario())
+
+
+def test_close_ends_idle_streams_with_resync():
+    broker = OrderEventBroker()
+
+    async def scenario():
+        streams = [await _open(broker, CUSTOMER), await _open(broker, ADMIN)]
+        waiting = [asyncio.ensure_future(stream.__anext__()) for stream in streams]
+        await asyncio.sleep(0)
+        broker.close()
+        messages = await asyncio.wait_for(asyncio.gather(*waiting), 1)
+        for stream in streams:
+            with pytest.raises(StopAsyncIteration):
+                await stream.__anext__()
+        # Streams opened after close end straight away too
+        late = await _open(broker, CUSTOMER)
+        messages.append(await asyncio.wait_for(late.__anext__(), 1))
+        return messages
+
+    assert asyncio.run(scenario()) == ["event: resync\ndata: {}\n\n"] * 3
+    assert broker.connections == 0
+
+
+def test_lifespan_shutdown_ends_open_streams():
+    from main import app
+
+    async def scenario():
+        async with app.router.lifespan_context(app):
+            stream = await _open(order_events, CUSTOMER)
+            waiting = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0)
+            assert not waiting.done()
+        return await asyncio.wait_for(waiting, 1)
+
+    assert asyncio.run(scenario()) == "event: resync\ndata: {}\n\n"
+    assert order_events.connections == 0
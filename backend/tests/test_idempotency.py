@@ -0,0 +1,108 @@
+"""Idempotency-Key: retries replay the first order instead of placing another."""
+import threading
+
+from fastapi import HTTPException
+
+from database import SessionLocal
+from idempotency import request_fingerprint
+from models import IdempotencyKey, Item, Order, User
+from routes.orders import _create_order, _place_order_once
+from schemas import OrderCreate
+
+THREADS = 20
+
+
+def _customer_id():
+    db = SessionLocal()
+    try:
+        return db.query(User.id).filter(User.email == "john@example.com").scalar()
+    finally:
+        db.close()
+
+
+def _stock(item_id):
+    db = SessionLocal()
+    try:
+        return db.get(Item, item_id).stock_quantity
+    finally:
+        db.close()
+
+
+def _orders_for(item_id):
+    db = SessionLocal()
+    try:
+        return db.query(Order).filter(Order.item_id == item_id).count()
+    finally:
+        db.close()
+
+
+def test_replay_returns_the_stored_order(client, customer_headers, make_item):
+    item_id = make_item(name="Idempotent", stock=10)
+    body = {"item_id": item_id, "service_type": "delivery", "quantity": 2}
+    headers = {**customer_headers, "Idempotency-Key": "replay-1"}
+
+    first = client.post("/api/orders/", json=body, headers=headers)
+    again = client.post("/api/orders/", json=body, headers=headers)
+
+    assert first.status_code == again.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.json() == first.json()
+    assert _orders_for(item_id) == 1
+    assert _stock(item_id) == 8
+
+
+def test_key_reused_for_a_different_request_is_rejected(client, customer_headers, make_item):
+    item_id = make_item(name="Idempotent changed", stock=10)
+    headers = {**customer_headers, "Idempotency-Key": "changed-1"}
+    body = {"item_id": item_id, "service_type": "delivery", "quantity": 1}
+
+    assert client.post("/api/orders/", json=body, headers=headers).status_code == 200
+    changed = client.post("/api/orders/", json={**body, "quantity": 3}, headers=headers)
+
+    assert changed.status_code == 422
+    assert _orders_for(item_id) == 1
+    assert _stock(item_id) == 9
+
+
+def test_concurrent_requests_with_one_key_place_one_order(make_item):
+    item_id = make_item(name="Idempotent race", stock=100)
+    user_id = _customer_id()
+    order = OrderCreate(item_id=item_id, service_type="delivery", quantity=1)
+    fingerprint = request_fingerprint("POST /api/orders/", order.model_dump_json())
+
+    barrier = threading.Barrier(THREADS)
+    results, errors = [], []
+    lock = threading.Lock()
+
+    def worker():
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            result = _place_order_once(db, user_id, "race-1", fingerprint, _create_order, order)
+            with lock:
+                results.append(result)
+        except HTTPException as e:
+            with lock:
+                errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+
+    assert not errors, [(e.status_code, e.detail) for e in errors]
+    assert len(results) == THREADS
+    # One request placed the order; every other one waited and replayed it
+    assert sum(1 for _, replayed in results if not replayed) == 1
+    assert len({placed.id for placed, _ in results}) == 1
+    assert _orders_for(item_id) == 1
+    assert _stock(item_id) == 99
+    db = SessionLocal()
+    try:
+        assert db.query(IdempotencyKey).filter(IdempotencyKey.key == "race-1").count() == 1
+    finally:
+        db.close()
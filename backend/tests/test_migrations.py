@@ -0,0 +1,68 @@
+"""Revisions with data backfills must agree with the application code."""
+import pytest
+from alembic import command
+from sqlalchemy import func, select, text
+
+from database import SessionLocal
+from migrate import alembic_config, upgrade_database
+from models import Item, Review, SalesDaily, SalesDailyCategory
+from ratings import remove_duplicate_reviews
+from sales import rebuild_sales_rollups
+
+
+def _rollups(db):
+    daily = db.execute(select(SalesDaily.__table__)).all()
+    by_category = db.execute(select(SalesDailyCategory.__table__)).all()
+    return sorted(map(tuple, daily), key=repr), sorted(map(tuple, by_category), key=repr)
+
+
+def test_sales_rollup_backfill_matches_a_rebuild():
+    # Back to before the rollup tables existed, then let 0007 backfill them
+    command.downgrade(alembic_config(), "0006")
+    upgrade_database()
+
+    db = SessionLocal()
+    try:
+        migrated = _rollups(db)
+        rebuild_sales_rollups(db)
+        rebuilt = _rollups(db)
+    finally:
+        db.close()
+    assert migrated[0] and migrated[1]
+    assert migrated == rebuilt
+
+
+def test_unique_review_revision_refuses_duplicates_until_deduped(db):
+    command.downgrade(alembic_config(), "0007")
+    first = db.scalars(select(Review).order_by(Review.id)).first()
+    duplicate = Review(user_id=first.user_id, item_id=first.item_id, rating=1, comment="again")
+    db.add(duplicate)
+    db.commit()
+    first_id, duplicate_id, item_id = first.id, duplicate.id, first.item_id
+    reviews = db.scalar(select(func.count(Review.id)))
+
+    with pytest.raises(RuntimeError, match=rf"user {first.user_id}, item {first.item_id}: 2 reviews"):
+        upgrade_database()
+    # Nothing was deleted on the way
+    assert db.scalar(select(func.count(Review.id))) == reviews
+
+    assert remove_duplicate_reviews(db) == 1
+    db.commit()
+    upgrade_database()
+
+    db.expire_all()
+    assert db.get(Review, duplicate_id) is None
+    assert db.get(Review, first_id) is not None
+    item = db.get(Item, item_id)
+    ratings = db.scalars(select(Review.rating).where(Review.item_id == item.id)).all()
+    assert (item.review_count, item.rating_sum) == (len(ratings), sum(ratings))
+
+
+def test_whole_second_sqlite_timestamps_are_padded(db):
+    command.downgrade(alembic_config(), "0009")
+    db.execute(text("UPDATE reviews SET created_at = '2026-10-18 09:30:15'"))
+    db.commit()
+    upgrade_database()
+
+    values = set(db.scalars(text("SELECT created_at FROM reviews")))
+    assert values == {"2026-10-18 09:30:15.000000"}
@@ -0,0 +1,160 @@
+"""Outbox delivery against a local aiosmtpd sink."""
+import socket
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import update
+
+import email_utils
+from database import SessionLocal
+from email_utils import SMTPSender, queue_email
+from models import EmailOutbox, EmailStatus
+from outbox import OUTBOX_MAX_ATTEMPTS, OutboxWorker
+
+
+class Sink:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos[0], envelope.content.decode()))
+        return "250 OK"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_sink(monkeypatch):
+    sink = Sink()
+    controller = Controller(sink, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    monkeypatch.setattr(email_utils, "EMAIL_HOST", "127.0.0.1")
+    monkeypatch.setattr(email_utils, "EMAIL_PORT", controller.port)
+    monkeypatch.setattr(email_utils, "EMAIL_USE_TLS", False)
+    monkeypatch.setattr(email_utils, "EMAIL_USER", "shop@example.com")
+    monkeypatch.setattr(email_utils, "EMAIL_PASS", None)
+    yield sink
+    controller.stop()
+
+
+@pytest.fixture
+def outbox(db):
+    db.query(EmailOutbox).delete()
+    db.commit()
+
+    def queue(*recipients):
+        for recipient in recipients:
+            queue_email(db, recipient, f"Hello {recipient}", "Body")
+        db.commit()
+        return [m.id for m in db.query(EmailOutbox).order_by(EmailOutbox.id)]
+
+    return queue
+
+
+def _rows():
+    db = SessionLocal()
+    try:
+        return {m.recipient: m for m in db.query(EmailOutbox).order_by(EmailOutbox.id)}
+    finally:
+        db.close()
+
+
+def _make_due():
+    db = SessionLocal()
+    try:
+        db.execute(update(EmailOutbox).values(next_attempt_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        db.commit()
+    finally:
+        db.close()
+
+
+class FlakySender(SMTPSender):
+    """Raises ``error`` instead of sending to any recipient listed in ``failing``."""
+
+    def __init__(self, failing, error):
+        super().__init__()
+        self.failing = set(failing)
+        self.error = error
+
+    def send(self, recipient, subject, body):
+        if recipient in self.failing:
+            raise self.error
+        super().send(recipient, subject, body)
+
+
+def test_batch_is_delivered_over_one_connection(smtp_sink, outbox):
+    outbox("a@example.com", "b@example.com", "c@example.com")
+    worker = OutboxWorker(sender=SMTPSender())
+    try:
+        assert worker.process_batch() == 3
+    finally:
+        worker.sender.close()
+
+    assert [recipient for recipient, _ in smtp_sink.messages] == ["a@example.com", "b@example.com", "c@example.com"]
+    rows = _rows()
+    assert {m.status for m in rows.values()} == {EmailStatus.SENT}
+    assert {m.attempts for m in rows.values()} == {1}
+
+
+def test_unexpected_error_only_fails_its_own_message(smtp_sink, outbox):
+    outbox("a@example.com", "broken@example.com", "c@example.com")
+    worker = OutboxWorker(sender=FlakySender({"broken@example.com"}, ValueError("bad header")))
+    try:
+        assert worker.process_batch() == 3
+        rows = _rows()
+        assert rows["a@example.com"].status == EmailStatus.SENT
+        assert rows["c@example.com"].status == EmailStatus.SENT
+        broken = rows["broken@example.com"]
+        assert broken.status == EmailStatus.PENDING
+        assert broken.attempts == 1 and "bad header" in broken.last_error
+
+        # Retrying must not send the delivered messages again
+        _make_due()
+        assert worker.process_batch() == 1
+    finally:
+        worker.sender.close()
+    assert len(smtp_sink.messages) == 2
+
+
+def test_message_fails_after_max_attempts(outbox):
+    outbox("down@example.com")
+    worker = OutboxWorker(sender=FlakySender({"down@example.com"}, OSError("connection refused")))
+    for attempt in range(OUTBOX_MAX_ATTEMPTS):
+        _make_due()
+        assert worker.process_batch() == 1
+    message = _rows()["down@example.com"]
+    assert message.status == EmailStatus.FAILED
+    assert message.attempts == OUTBOX_MAX_ATTEMPTS
+    _make_due()
+    assert worker.process_batch() == 0
+
+
+def test_claimed_rows_are_not_locked_or_reclaimed_while_sending(smtp_sink, outbox):
+    outbox("a@example.com", "b@example.com")
+    seen = []
+
+    class CheckingSender(SMTPSender):
+        def send(self, recipient, subject, body):
+            # Another writer can touch the outbox mid-batch (no transaction is
+            # held open), and a second worker finds nothing left to claim
+            db = SessionLocal()
+            try:
+                db.execute(update(EmailOutbox).where(EmailOutbox.recipient == recipient).values(last_error=None))
+                db.commit()
+            finally:
+                db.close()
+            seen.append(OutboxWorker(sender=SMTPSender()).process_batch())
+            super().send(recipient, subject, body)
+
+    worker = OutboxWorker(sender=CheckingSender())
+    try:
+        assert worker.process_batch() == 2
+    finally:
+        worker.sender.close()
+    assert seen == [0, 0]
+    assert len(smtp_sink.messages) == 2
@@ -0,0 +1,56 @@
+"""Keyset cursors over created_at: full precision, no rows skipped or repeated."""
+from datetime import datetime
+
+from sqlalchemy import text
+
+from cache import response_cache
+from database import SessionLocal
+from models import Item
+
+
+def test_created_at_keeps_fractional_seconds(db):
+    stamp = datetime(2026, 10, 18, 9, 30, 15, 123456)
+    item = Item(name="Precise", price=1.0, category="Precision", stock_quantity=1, created_at=stamp)
+    db.add(item)
+    db.commit()
+    db.expire_all()
+    assert db.get(Item, item.id).created_at.replace(tzinfo=None) == stamp
+
+
+def test_cursor_pages_through_defaulted_and_explicit_timestamps(client):
+    db = SessionLocal()
+    try:
+        # Defaults from one transaction share a timestamp, so only id breaks ties
+        defaulted = [Item(name=f"Same instant {n}", price=1.0, category="Keyset", stock_quantity=1) for n in range(5)]
+        db.add_all(defaulted)
+        db.commit()
+        same_second = db.get(Item, defaulted[0].id).created_at.replace(microsecond=0, tzinfo=None)
+        explicit = [
+            Item(name=f"Explicit {n}", price=1.0, category="Keyset", stock_quantity=1,
+                 created_at=same_second.replace(microsecond=micros))
+            for n, micros in enumerate((0, 0, 999999))
+        ]
+        db.add_all(explicit)
+        db.commit()
+        stored = {
+            length for (length,) in db.execute(text("SELECT length(created_at) FROM items WHERE category = 'Keyset'"))
+        }
+        expected = {item.id for item in defaulted + explicit}
+    finally:
+        db.close()
+    # One text layout for every row, whichever way its timestamp was set
+    assert stored == {26}
+
+    response_cache.clear()
+    seen, cursor = [], None
+    while True:
+        params = {"category": "Keyset", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/items/", params=params)
+        seen.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(expected)
+    assert len(seen) == len(expected)
@@ -0,0 +1,93 @@
+"""List endpoints must run a fixed number of statements whatever the page size (no N+1)."""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from auth import get_password_hash
+from cache import response_cache
+from database import SessionLocal, engine
+from models import Item, Order, OrderLine, OrderStatus, Review, ServiceType, User
+
+ROWS = 60
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture(scope="module")
+def catalogue_and_orders():
+    db = SessionLocal()
+    try:
+        customer = db.query(User).filter(User.email == "john@example.com").one()
+        occasional = User(
+            name="Occasional", email="occasional@example.com",
+            password_hash=get_password_hash("password123"), role="customer"
+        )
+        db.add(occasional)
+        items = [
+            Item(name=f"Counted item {n}", price=5.0 + n, category="Counted", stock_quantity=100)
+            for n in range(ROWS)
+        ]
+        db.add_all(items)
+        db.flush()
+        db.add_all(Review(user_id=customer.id, item_id=item.id, rating=4) for item in items)
+        for n, item in enumerate(items):
+            db.add(Order(
+                user_id=occasional.id if n == 0 else customer.id,
+                item_id=item.id,
+                service_type=ServiceType.DELIVERY,
+                status=OrderStatus.PENDING,
+                quantity=1,
+                total_price=item.price,
+                lines=[OrderLine(item_id=item.id, quantity=1, unit_price=item.price, line_total=item.price)]
+            ))
+        db.commit()
+        return customer.id, occasional.id
+    finally:
+        db.close()
+
+
+def _statements_for(client, url, headers=None):
+    # Warm up per-user lookups the auth dependency caches, then make sure the
+    # response cache can't skip the database and hide the difference
+    client.get(url, headers=headers)
+    response_cache.clear()
+    with count_statements() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json(), statements
+
+
+def test_item_list_query_count_is_independent_of_page_size(client, catalogue_and_orders):
+    one, small = _statements_for(client, "/api/items/?limit=1")
+    many, large = _statements_for(client, "/api/items/?limit=50")
+    assert (len(one), len(many)) == (1, 50)
+    assert len(small) == len(large), large
+
+
+def test_admin_order_list_query_count_is_independent_of_page_size(client, admin_headers, catalogue_and_orders):
+    one, small = _statements_for(client, "/api/orders/all?limit=1", admin_headers)
+    many, large = _statements_for(client, "/api/orders/all?limit=50", admin_headers)
+    assert (len(one), len(many)) == (1, 50)
+    assert all(order["item"] and order["user"] and order["lines"] for order in many)
+    assert len(small) == len(large), large
+
+
+def test_user_order_list_query_count_is_independent_of_order_count(client, admin_headers, catalogue_and_orders):
+    customer_id, occasional_id = catalogue_and_orders
+    few, small = _statements_for(client, f"/api/orders/user/{occasional_id}", admin_headers)
+    many, large = _statements_for(client, f"/api/orders/user/{customer_id}", admin_headers)
+    assert len(few) == 1 and len(many) >= 50
+    assert len(small) == len(large), large
@@ -0,0 +1,78 @@
+"""Rate limiting and load shedding in RateLimitMiddleware."""
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ratelimit import MemoryBuckets, RateLimitMiddleware, parse_limits
+
+
+def _app(limits="POST /api/auth/login=ip:3/60", max_in_flight=0):
+    app = FastAPI()
+
+    release = app.state.release = asyncio.Event()
+
+    @app.post("/api/auth/login")
+    async def login():
+        return {"ok": True}
+
+    @app.get("/api/items/")
+    async def items():
+        await release.wait()
+        return []
+
+    @app.get("/api/orders/events")
+    async def events():
+        await release.wait()
+        return {}
+
+    app.add_middleware(
+        RateLimitMiddleware,
+        router_app=app,
+        limits=parse_limits(limits),
+        buckets=MemoryBuckets(),
+        max_in_flight=max_in_flight,
+    )
+    return app
+
+
+def test_forwarded_for_header_cannot_dodge_ip_limit():
+    client = TestClient(_app())
+    statuses = [
+        client.post("/api/auth/login", headers={"X-Forwarded-For": f"10.0.0.{n}"}).status_code
+        for n in range(6)
+    ]
+    assert statuses == [200, 200, 200, 429, 429, 429]
+
+
+def test_only_the_event_stream_route_skips_the_watermark():
+    async def scenario():
+        app = _app(limits="", max_in_flight=2)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            stream = {"Accept": "text/event-stream"}
+            held = [
+                asyncio.create_task(client.get("/api/orders/events", headers=stream))
+                for _ in range(3)
+            ]
+            held += [
+                asyncio.create_task(client.get("/api/items/", headers=stream))
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0.1)
+
+            # Open streams don't count; the two item requests fill the watermark,
+            # whatever Accept header they send
+            shed = await asyncio.wait_for(client.get("/api/items/", headers=stream), 5)
+            assert shed.status_code == 503
+            assert shed.headers["Retry-After"] == "1"
+            extra = asyncio.create_task(client.get("/api/orders/events", headers=stream))
+            await asyncio.sleep(0.1)
+            assert not extra.done()
+
+            app.state.release.set()
+            responses = await asyncio.gather(*held, extra)
+            assert [r.status_code for r in responses] == [200] * 6
+
+    asyncio.run(scenario())
@@ -0,0 +1,120 @@
+"""Shared Redis backends (response cache, rate limits) against fakeredis."""
+import asyncio
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from cache import MemoryBackend, RedisBackend, ResponseCache
+from ratelimit import Limit, RedisBuckets
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+def test_redis_cache_round_trip_and_invalidation(redis_client):
+    cache = ResponseCache(RedisBackend(client=redis_client), ttl=60)
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return b'{"ok": true}', {"ETag": '"v1"'}
+
+    async def scenario():
+        first = await cache.get_or_build(("items", "item:1"), "detail", build)
+        second = await cache.get_or_build(("items", "item:1"), "detail", build)
+        cache.invalidate("item:1")
+        third = await cache.get_or_build(("items", "item:1"), "detail", build)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first == second == third == (b'{"ok": true}', {"ETag": '"v1"'})
+    assert len(builds) == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 2, 1)
+
+
+def test_redis_generations_are_shared_between_workers(redis_client):
+    worker_a = ResponseCache(RedisBackend(client=redis_client))
+    worker_b = ResponseCache(RedisBackend(client=redis_client))
+
+    async def scenario():
+        versioned, _ = await worker_a.lookup(("catalogue",), "list")
+        await worker_a.store(versioned, (b"[]", {}))
+        hit = (await worker_b.lookup(("catalogue",), "list"))[1]
+        worker_b.invalidate("catalogue")
+        miss = (await worker_a.lookup(("catalogue",), "list"))[1]
+        return hit, miss
+
+    hit, miss = asyncio.run(scenario())
+    assert hit == (b"[]", {})
+    assert miss is None
+
+
+class SlowRedisBackend(RedisBackend):
+    def bump(self, namespaces):
+        time.sleep(0.3)
+        super().bump(namespaces)
+
+
+def test_invalidation_never_blocks_the_event_loop(redis_client):
+    cache = ResponseCache(SlowRedisBackend(client=redis_client))
+
+    async def scenario():
+        versioned, _ = await cache.lookup(("items",), "list")
+        await cache.store(versioned, (b"old", {}))
+        started = time.perf_counter()
+        # As an after_commit hook in DB_MODE=async would
+        cache.invalidate("items")
+        returned_after = time.perf_counter() - started
+        # The next read in this worker still sees the invalidation
+        _, cached = await cache.lookup(("items",), "list")
+        return returned_after, cached
+
+    returned_after, cached = asyncio.run(scenario())
+    assert returned_after < 0.1
+    assert cached is None
+
+
+def test_invalidation_off_the_loop_is_applied_inline(redis_client):
+    # Threadpool code (DB_MODE=sync, CLIs) may block, and nothing is deferred
+    cache = ResponseCache(RedisBackend(client=redis_client))
+    thread = threading.Thread(target=cache.invalidate, args=("items", "catalogue"))
+    thread.start()
+    thread.join()
+    assert not cache._pending
+    assert cache.backend.generations(["items", "catalogue"]) == [1, 1]
+
+
+def test_memory_backend_invalidates_inline():
+    cache = ResponseCache(MemoryBackend())
+
+    async def scenario():
+        cache.invalidate("items")
+        return cache._pending, cache.backend.generations(["items"])
+
+    pending, generations = asyncio.run(scenario())
+    assert not pending and generations == [1]
+
+
+def test_redis_token_bucket_limits_and_refills(redis_client):
+    buckets = RedisBuckets(client=redis_client)
+    limit = Limit("ip", 3, 0.3)
+    assert [buckets.take("login|ip:1.2.3.4", limit) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = buckets.take("login|ip:1.2.3.4", limit)
+    assert 0 < wait <= 0.1
+    # Other clients have their own bucket
+    assert buckets.take("login|ip:5.6.7.8", limit) == 0.0
+    time.sleep(0.15)
+    assert buckets.take("login|ip:1.2.3.4", limit) == 0.0
+
+
+def test_redis_buckets_are_shared_between_workers(redis_client):
+    limit = Limit("user", 2, 60)
+    worker_a, worker_b = RedisBuckets(client=redis_client), RedisBuckets(client=redis_client)
+    assert worker_a.take("orders|user:7", limit) == 0.0
+    assert worker_b.take("orders|user:7", limit) == 0.0
+    assert worker_a.take("orders|user:7", limit) > 0
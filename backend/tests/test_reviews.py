@@ -0,0 +1,55 @@
+"""Review listings: bounded pages by default and cheap ETags."""
+from sqlalchemy import func
+
+from auth import get_password_hash
+from database import SessionLocal
+from models import Item, Review, User
+from routes.reviews import DEFAULT_REVIEW_PAGE
+from tests.test_query_counts import count_statements
+
+
+def _add_reviews(count):
+    db = SessionLocal()
+    try:
+        reviewer = User(
+            name="Prolific", email=f"prolific{count}@example.com",
+            password_hash=get_password_hash("password123"), role="customer"
+        )
+        items = [Item(name=f"Reviewed {n}", price=1.0, category="Reviewed", stock_quantity=1) for n in range(count)]
+        db.add(reviewer)
+        db.add_all(items)
+        db.flush()
+        db.add_all(Review(user_id=reviewer.id, item_id=item.id, rating=5) for item in items)
+        db.commit()
+        return db.query(func.count(Review.id)).scalar()
+    finally:
+        db.close()
+
+
+def test_review_list_is_paged_unless_all_is_asked_for(client):
+    total = _add_reviews(DEFAULT_REVIEW_PAGE + 5)
+
+    page = client.get("/api/reviews/all")
+    assert len(page.json()) == DEFAULT_REVIEW_PAGE
+    rest = client.get("/api/reviews/all", params={"cursor": page.headers["X-Next-Cursor"], "limit": 500})
+    assert len(page.json()) + len(rest.json()) == total
+
+    everything = client.get("/api/reviews/all", params={"all": "true"})
+    assert len(everything.json()) == total
+    assert [r["id"] for r in everything.json()] == [r["id"] for r in page.json() + rest.json()]
+
+
+def test_streamed_review_etag_skips_counting(client):
+    _add_reviews(3)
+    first = client.get("/api/reviews/all", params={"all": "true"})
+    etag = first.headers["ETag"]
+
+    with count_statements() as statements:
+        cached = client.get("/api/reviews/all", params={"all": "true"}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert not any("count(" in statement.lower() for statement in statements), statements
+
+    _add_reviews(1)
+    changed = client.get("/api/reviews/all", params={"all": "true"}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
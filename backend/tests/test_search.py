@@ -0,0 +1,143 @@
+"""In-process search index: typo tolerance, plurals and single-flight rebuilds."""
+import threading
+import time
+
+import pytest
+
+import search
+from models import Item
+from search import InvertedIndex, search_items
+
+
+@pytest.fixture
+def index():
+    idx = InvertedIndex()
+    idx.rebuild([
+        (1, "Fresh Mangoes", "Sweet Alphonso mangoes"),
+        (2, "Organic Milk", "Full cream milk"),
+        (3, "Coconut Water", "Tender coconut water"),
+        (4, "Fresh Apples", "Crisp red apples"),
+        (5, "Curd", "Thick homemade curd"),
+    ])
+    return idx
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("mango", 1),       # singular finds the plural
+    ("apple", 4),
+    ("mnago", 1),       # transposition
+    ("mlik", 2),        # transposition in a short word
+    ("cocnut", 3),      # dropped letter
+    ("coco", 3),        # prefix while typing
+    ("crud", 5),
+])
+def test_finds_item_despite_typos_and_plurals(index, query, expected):
+    assert index.search(query, 5)[:1] == [expected]
+
+
+def test_exact_matches_rank_above_typos(index):
+    index.upsert(6, "Mango Pulp", "Tinned mango")
+    index.upsert(7, "Mongo Bars", "Chocolate")
+    ranked = index.search("mango", 5)
+    assert set(ranked[:2]) == {1, 6}
+    assert ranked[2:] == [7]
+
+
+def test_unrelated_words_do_not_match(index):
+    assert index.search("bread", 5) == []
+    assert index.search("ox", 5) == []
+
+
+def test_search_items_builds_the_index_once_under_concurrency(db, monkeypatch):
+    calls = []
+    real_rebuild = search.rebuild_search_index
+
+    def counting_rebuild(session):
+        calls.append(1)
+        time.sleep(0.2)
+        real_rebuild(session)
+
+    monkeypatch.setattr(search, "search_index", InvertedIndex())
+    monkeypatch.setattr(search, "rebuild_search_index", counting_rebuild)
+    monkeypatch.setattr(search, "SEARCH_BACKEND", "memory")
+
+    from database import SessionLocal
+    results = []
+
+    def worker():
+        session = SessionLocal()
+        try:
+            results.append([item.name for item in search_items(session, "mnago", 5)])
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert len(calls) == 1
+    assert results == [["Fresh Mangoes"]] * 8
+
+
+def test_stale_index_is_refreshed_in_the_background(db, monkeypatch):
+    calls = []
+    release = threading.Event()
+    real_rebuild = search.rebuild_search_index
+
+    def slow_rebuild(session):
+        calls.append(1)
+        release.wait(10)
+        real_rebuild(session)
+
+    monkeypatch.setattr(search, "search_index", InvertedIndex())
+    monkeypatch.setattr(search, "SEARCH_BACKEND", "memory")
+    search_items(db, "milk", 5)
+    monkeypatch.setattr(search, "rebuild_search_index", slow_rebuild)
+    monkeypatch.setattr(search, "SEARCH_INDEX_REFRESH_SECONDS", 0)
+
+    # Stale: every request keeps answering from the old index while one refresh runs
+    for _ in range(5):
+        assert [item.name for item in search_items(db, "milk", 5)] == ["Organic Milk"]
+    release.set()
+    for _ in range(100):
+        if not search._rebuild_lock.locked():
+            break
+        time.sleep(0.01)
+    assert len(calls) == 1
+
+
+def test_changes_during_a_rebuild_survive_the_swap(index):
+    def rows():
+        yield 1, "Fresh Mangoes", "Sweet Alphonso mangoes"
+        # Committed while the rebuild is still reading its snapshot
+        index.upsert(9, "Jackfruit", "Ripe jackfruit")
+        index.remove(2)
+        yield 2, "Organic Milk", "Full cream milk"
+
+    index.rebuild(rows())
+
+    assert index.search("jackfruit", 5) == [9]
+    assert index.search("milk", 5) == []
+    assert index.search("mango", 5) == [1]
+
+
+def test_only_committed_item_writes_reach_the_index(db, make_item, monkeypatch):
+    monkeypatch.setattr(search, "search_index", InvertedIndex())
+    monkeypatch.setattr(search, "SEARCH_BACKEND", "memory")
+    item_id = make_item(name="Guava", description="Pink guava")
+    search_items(db, "guava", 5)
+
+    item = db.get(Item, item_id)
+    item.name = "Papaya"
+    db.add(Item(name="Lychee", price=5, stock_quantity=1, category="Test", description="Lychee"))
+    db.flush()
+    db.rollback()
+    assert search.search_index.search("papaya", 5) == []
+    assert search.search_index.search("lychee", 5) == []
+    assert search.search_index.search("guava", 5) == [item_id]
+
+    db.get(Item, item_id).name = "Papaya"
+    db.commit()
+    assert search.search_index.search("papaya", 5) == [item_id]
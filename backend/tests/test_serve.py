@@ -0,0 +1,24 @@
+"""Launcher settings in serve.py."""
+import serve
+
+
+def test_metrics_dir_only_loses_stale_metric_files(tmp_path, monkeypatch):
+    (tmp_path / "counter_123.db").write_bytes(b"stale")
+    (tmp_path / "notes.txt").write_text("keep")
+    (tmp_path / "nested").mkdir()
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    serve.prepare_metrics_dir(4)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["nested", "notes.txt"]
+
+
+def test_metrics_dir_defaults_to_a_fresh_directory(monkeypatch):
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    serve.prepare_metrics_dir(1)
+    assert "PROMETHEUS_MULTIPROC_DIR" not in serve.os.environ
+
+    serve.prepare_metrics_dir(2)
+    path = serve.os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    assert serve.os.path.isdir(path) and not serve.os.listdir(path)
+    serve.os.rmdir(path)
@@ -0,0 +1,118 @@
+"""Concurrent orders must never oversell or drive stock negative."""
+import threading
+
+from fastapi import HTTPException
+
+from database import SessionLocal
+from models import Item, Order, OrderStatus, User
+from routes.orders import _checkout, _create_order, _update_order_status
+from schemas import CheckoutCreate, OrderCreate
+
+THREADS = 40
+
+
+def _customer_id():
+    db = SessionLocal()
+    try:
+        return db.query(User.id).filter(User.email == "john@example.com").scalar()
+    finally:
+        db.close()
+
+
+def _stock(item_id):
+    db = SessionLocal()
+    try:
+        return db.get(Item, item_id).stock_quantity
+    finally:
+        db.close()
+
+
+def _run_concurrently(place, *args):
+    """Call place(db, *args) from THREADS threads at once; returns (orders, refusals)."""
+    barrier = threading.Barrier(THREADS)
+    orders, refusals, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker():
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            order = place(db, *args)
+            with lock:
+                orders.append(order)
+        except HTTPException as e:
+            with lock:
+                refusals.append(e)
+        except Exception as e:
+            with lock:
+                errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+    assert not errors, errors
+    assert len(orders) + len(refusals) == THREADS
+    assert all(e.status_code == 400 for e in refusals)
+    return orders, refusals
+
+
+def test_concurrent_orders_never_oversell(make_item):
+    item_id = make_item(name="Contended", stock=20)
+    order = OrderCreate(item_id=item_id, service_type="delivery", quantity=3)
+
+    orders, refusals = _run_concurrently(_create_order, _customer_id(), order)
+
+    assert len(orders) == 6
+    assert _stock(item_id) == 2
+    db = SessionLocal()
+    try:
+        placed = db.query(Order).filter(Order.item_id == item_id).all()
+        assert sum(o.quantity for o in placed) == 18
+    finally:
+        db.close()
+
+
+def test_concurrent_checkouts_reserve_all_lines_or_none(make_item):
+    first = make_item(name="Contended A", stock=10)
+    second = make_item(name="Contended B", stock=25)
+    checkout = CheckoutCreate(
+        service_type="delivery",
+        lines=[{"item_id": second, "quantity": 2}, {"item_id": first, "quantity": 1}]
+    )
+
+    orders, _ = _run_concurrently(_checkout, _customer_id(), checkout)
+
+    # A runs out after 10 carts; the refused carts take nothing from B
+    assert len(orders) == 10
+    assert _stock(first) == 0
+    assert _stock(second) == 5
+
+
+def test_cancelling_restores_stock_once(make_item):
+    item_id = make_item(name="Returned", stock=5)
+    db = SessionLocal()
+    try:
+        order = _create_order(db, _customer_id(), OrderCreate(item_id=item_id, service_type="delivery", quantity=4))
+    finally:
+        db.close()
+    assert _stock(item_id) == 1
+
+    for _ in range(2):
+        db = SessionLocal()
+        try:
+            _update_order_status(db, order.id, OrderStatus.CANCELLED, "Changed my mind")
+        finally:
+            db.close()
+    assert _stock(item_id) == 5
+
+    # Reinstating the order has to win its stock back
+    db = SessionLocal()
+    try:
+        _update_order_status(db, order.id, OrderStatus.CONFIRMED, None)
+    finally:
+        db.close()
+    assert _stock(item_id) == 1